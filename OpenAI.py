@@ -1,41 +1,63 @@
+import argparse
 import json
 import os
+import threading
 import time
-from openai import OpenAI, APIError, Timeout, APIConnectionError
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from openai import OpenAI, APIError, APITimeoutError, APIConnectionError
+from typing import Dict, Any, List, Optional
+from relation_cache import RelationCache, pair_key
+from candidate_pairs import candidate_targets
 
 
-BASE_URL = 'https://api.avalai.ir/v1'
-API_KEY = ''
+# Override with OPENAI_BASE_URL to point the extraction at a local mock of the chat-completions endpoint
+BASE_URL = os.environ.get('OPENAI_BASE_URL', 'https://api.avalai.ir/v1')
+API_KEY = os.environ.get('OPENAI_API_KEY', '')
+MODEL = 'gpt-4o'
 
-client = OpenAI(base_url=BASE_URL, api_key=API_KEY, timeout=60.0)
+# Retries are classify_targets' job, so that a 504 backs off every worker through the TokenBucket
+client = OpenAI(base_url=BASE_URL, api_key=API_KEY, timeout=60.0, max_retries=0)
 
 
-dataset_path = os.path.join(os.path.dirname(__file__), 'dataset.json')
-with open(dataset_path, 'r', encoding='utf-8') as f:
-    dataset = json.load(f)
+class TokenBucket:
+    # Rate limiter shared by all workers: `rate` requests per second, bursts up to `capacity`.
+    # backoff() pauses every worker, so a 504/timeout slows the whole pool down, not one request.
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
 
-arguments = dataset['arguments']
-arg_by_id = {arg['id']: arg for arg in arguments}
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            time.sleep(wait)
 
-def extract_relations(argument_id: str, max_retries: int = 5) -> Dict[str, str]:
-    current = arg_by_id[argument_id]
-    current_text = current['text']
-    current_stance = 'root' if argument_id == 'N' else current.get('stance', 'unknown')
+    def backoff(self, seconds: float) -> None:
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
 
-    targets = {aid: arg for aid, arg in arg_by_id.items() if aid != argument_id}
-    if not targets:
-        return {}
 
-    target_lines = []
-    json_template_lines = []
-    for tid in sorted(targets.keys()):
-        tstance = 'root' if tid == 'N' else targets[tid].get('stance', 'unknown')
-        ttext = targets[tid]['text']
-        target_lines.append(f"  - {tid} (stance: {tstance}): {ttext}")
-        json_template_lines.append(f'    "{tid}": "attack" or "defend" or "none"')
+def load_dataset(path: str) -> Dict[str, Any]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are an expert in argumentation mining.
 
 CURRENT argument ({argument_id}) — Stance: {current_stance}
@@ -49,18 +71,76 @@ Classify the directed relation from the CURRENT argument to EACH target:
 Base your decision purely on semantic content. Do NOT assume same stance = defend.
 
 Targets:
-{chr(10).join(target_lines)}
+{target_lines}
 
 Return ONLY this JSON (no markdown, no extra text):
 {{
-{chr(10).join(json_template_lines)}
+{json_template_lines}
 }}
 """.strip()
 
+
+def stance_of(argument_id: str, arg: Dict[str, Any]) -> str:
+    return 'root' if argument_id == 'N' else arg.get('stance', 'unknown')
+
+
+def build_prompt(argument_id: str, arg_by_id: Dict[str, Dict[str, Any]],
+                 target_ids: Optional[List[str]] = None) -> Optional[str]:
+    # target_ids restricts the prompt to some targets (e.g. the ones missing from the cache)
+    current = arg_by_id[argument_id]
+    if target_ids is None:
+        target_ids = [aid for aid in arg_by_id if aid != argument_id]
+    if not target_ids:
+        return None
+
+    target_lines = []
+    json_template_lines = []
+    for tid in sorted(target_ids):
+        target_lines.append(f"  - {tid} (stance: {stance_of(tid, arg_by_id[tid])}): {arg_by_id[tid]['text']}")
+        json_template_lines.append(f'    "{tid}": "attack" or "defend" or "none"')
+
+    return PROMPT_TEMPLATE.format(argument_id=argument_id, current_stance=stance_of(argument_id, current),
+                                  current_text=current['text'], target_lines="\n".join(target_lines),
+                                  json_template_lines="\n".join(json_template_lines))
+
+
+def cache_key(source_id: str, target_id: str, arg_by_id: Dict[str, Dict[str, Any]]) -> str:
+    source, target = arg_by_id[source_id], arg_by_id[target_id]
+    return pair_key(MODEL, PROMPT_TEMPLATE,
+                    f"{source_id}|{stance_of(source_id, source)}|{source['text']}",
+                    f"{target_id}|{stance_of(target_id, target)}|{target['text']}")
+
+
+def parse_relations(raw: str) -> Dict[str, str]:
+    raw = raw.strip()
+
+    # Clean ```json blocks
+    if raw.startswith("```"):
+        raw = raw.split("\n", 1)[1] if "\n" in raw else raw[3:]
+        raw = raw.rsplit("```", 1)[0].strip()
+
+    relations = json.loads(raw)
+    return {k: v for k, v in relations.items() if v in ["attack", "defend", "none"]}
+
+
+def meaningful_relations(relations: Dict[str, str]) -> Dict[str, str]:
+    return {k: v for k, v in relations.items() if v in ["attack", "defend"]}
+
+
+def classify_targets(argument_id: str, arg_by_id: Dict[str, Dict[str, Any]], target_ids: List[str],
+                     limiter: Optional[TokenBucket] = None, max_retries: int = 5) -> Optional[Dict[str, str]]:
+    # One model call (with retries) classifying argument_id against target_ids; None on failure
+    prompt = build_prompt(argument_id, arg_by_id, target_ids)
+    if prompt is None:
+        return {}
+
     for attempt in range(max_retries):
+        raw = None
         try:
+            if limiter is not None:
+                limiter.acquire()
             response = client.chat.completions.create(
-                model="gpt-4o",
+                model=MODEL,
                 messages=[
                     {"role": "system", "content": "Return only valid JSON. No explanations."},
                     {"role": "user", "content": prompt}
@@ -70,22 +150,16 @@ Return ONLY this JSON (no markdown, no extra text):
                 max_tokens=1000
             )
 
-            raw = response.choices[0].message.content.strip()
-
-            # Clean ```json blocks
-            if raw.startswith("```"):
-                raw = raw.split("\n", 1)[1] if "\n" in raw else raw[3:]
-                raw = raw.rsplit("```", 1)[0].strip()
+            raw = response.choices[0].message.content
+            return {tid: rel for tid, rel in parse_relations(raw).items() if tid in target_ids}
 
-            relations = json.loads(raw)
-            meaningful = {k: v for k, v in relations.items() if v in ["attack", "defend"]}
-            print(f"{argument_id} → {meaningful}")
-            return meaningful
-
-        except (Timeout, APIConnectionError, APIError) as e:
+        except (APITimeoutError, APIConnectionError, APIError) as e:
             print(f"Attempt {attempt + 1}/{max_retries} failed for {argument_id}: {e.__class__.__name__}")
             if "504" in str(e) or "timeout" in str(e).lower():
-                time.sleep(2 ** attempt)
+                if limiter is not None:
+                    limiter.backoff(2 ** attempt)
+                else:
+                    time.sleep(2 ** attempt)
                 continue
             else:
                 print(f"Permanent error: {e}")
@@ -93,7 +167,7 @@ Return ONLY this JSON (no markdown, no extra text):
 
         except json.JSONDecodeError as e:
             print(f"JSON parsing failed for {argument_id}: {e}")
-            print(f"Raw output: {raw if 'raw' in locals() else 'N/A'}")
+            print(f"Raw output: {raw if raw is not None else 'N/A'}")
             time.sleep(2)
             continue
 
@@ -102,20 +176,186 @@ Return ONLY this JSON (no markdown, no extra text):
             break
 
     print(f"FAILED after {max_retries} attempts: {argument_id}")
-    return {}
+    return None
+
+
+def extract_relations(argument_id: str, arg_by_id: Dict[str, Dict[str, Any]], limiter: Optional[TokenBucket] = None,
+                      max_retries: int = 5, cache: Optional[RelationCache] = None,
+                      chunk_size: Optional[int] = None, candidates: Optional[List[str]] = None) -> Dict[str, str]:
+    # candidates: the only targets worth asking about (see candidate_pairs.py); others count as 'none'.
+    # chunk_size: at most this many targets per call, so each prompt and answer stays O(chunk_size).
+    return _extract_relations(argument_id, arg_by_id, limiter, max_retries, cache, chunk_size, candidates)[0]
+
+
+def _extract_relations(argument_id, arg_by_id, limiter, max_retries, cache, chunk_size, candidates):
+    # (meaningful relations, whether every chunk was answered)
+    target_ids = [aid for aid in arg_by_id if aid != argument_id]
+    if candidates is not None:
+        wanted = set(candidates)
+        target_ids = [tid for tid in target_ids if tid in wanted]
+    known = {}
+    if cache is not None:
+        keys = {tid: cache_key(argument_id, tid, arg_by_id) for tid in target_ids}
+        cached = cache.get_many(keys.values())
+        known = {tid: cached[key] for tid, key in keys.items() if key in cached}
+        target_ids = [tid for tid in target_ids if tid not in known]
+        if not target_ids:
+            meaningful = meaningful_relations(known)
+            print(f"{argument_id} → {meaningful} (cached)")
+            return meaningful, True
+
+    step = chunk_size or max(len(target_ids), 1)
+    relations = {}
+    complete = True
+    for i in range(0, len(target_ids), step):
+        chunk = target_ids[i:i + step]
+        answer = classify_targets(argument_id, arg_by_id, chunk, limiter, max_retries)
+        if answer is None:
+            complete = False
+            continue
+        if cache is not None:
+            cache.put_many({keys[tid]: rel for tid, rel in answer.items()})
+        relations.update(answer)
+
+    meaningful = meaningful_relations({**known, **relations})
+    print(f"{argument_id} → {meaningful}")
+    return meaningful, complete
+
+
+class Checkpoint:
+    # Append-only JSONL log of finished arguments, one {"id", "relationships"} record per line.
+    # Each record is flushed and fsynced as soon as it is written, so a crash loses at most
+    # the calls still in flight.
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        # Start on a fresh line if the previous run died in the middle of a record
+        if resume and self.file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self.file.write('\n')
+
+    def write(self, argument_id: str, relationships: Dict[str, str]) -> None:
+        line = json.dumps({'id': argument_id, 'relationships': relationships}, ensure_ascii=False)
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+def load_checkpoint(path: str) -> Dict[str, Dict[str, str]]:
+    # argument id -> relationships; later records win, and a line cut short by a crash is ignored
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record['id']] = record['relationships']
+    return done
+
+
+def compact(dataset: Dict[str, Any], checkpoint_path: str, output_path: str) -> int:
+    # Merge the checkpointed relations into the dataset and write it atomically.
+    # Returns the number of arguments that still have no record.
+    done = load_checkpoint(checkpoint_path)
+    missing = 0
+    for arg in dataset['arguments']:
+        if arg['id'] in done:
+            arg['relationships'] = done[arg['id']]
+        else:
+            missing += 1
+    tmp = output_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(dataset, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, output_path)
+    return missing
+
+
+def extract_all(arguments: List[Dict[str, Any]], workers: int = 1, rate: float = 2.0,
+                max_retries: int = 5, cache: Optional[RelationCache] = None, chunk_size: Optional[int] = None,
+                prefilter_top: Optional[int] = None, checkpoint: Optional[Checkpoint] = None,
+                done: Optional[Dict[str, Dict[str, str]]] = None) -> None:
+    # Runs up to `workers` requests at once under one shared rate limit and writes the
+    # relations back onto `arguments` in their original order.
+    # Arguments in `done` (a loaded checkpoint) are not sent again; every argument whose
+    # chunks all succeed is appended to `checkpoint` as soon as it finishes.
+    done = done or {}
+    arg_by_id = {arg['id']: arg for arg in arguments}
+    limiter = TokenBucket(rate)
+    candidates = candidate_targets(arguments, prefilter_top) if prefilter_top else {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_extract_relations, arg['id'], arg_by_id, limiter, max_retries, cache, chunk_size,
+                               candidates.get(arg['id'])): arg for arg in arguments if arg['id'] not in done}
+        for future in as_completed(futures):
+            arg = futures[future]
+            relations, complete = future.result()
+            if checkpoint is not None and complete:
+                checkpoint.write(arg['id'], relations)
+            arg['relationships'] = relations
+    for arg in arguments:
+        if arg['id'] in done:
+            arg['relationships'] = done[arg['id']]
+
 
+if __name__ == "__main__":
+    here = os.path.dirname(__file__)
+    parser = argparse.ArgumentParser(description="Extract attack/defend relations between arguments with an LLM.")
+    parser.add_argument('--input', default=os.path.join(here, 'dataset.json'))
+    parser.add_argument('--output', default=os.path.join(here, 'dataset_with_relations.json'))
+    parser.add_argument('--workers', type=int, default=1, help="concurrent requests")
+    parser.add_argument('--rate', type=float, default=2.0, help="maximum requests per second over all workers")
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--cache', default=os.path.join(here, 'relation_cache.sqlite'),
+                        help="SQLite cache of pairwise classifications")
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=None, help="maximum targets per request")
+    parser.add_argument('--prefilter-top', type=int, default=None,
+                        help="only ask about the K most lexically similar targets (plus N) per argument")
+    parser.add_argument('--checkpoint', default=os.path.join(here, 'relations_checkpoint.jsonl'),
+                        help="JSONL log of finished arguments")
+    parser.add_argument('--resume', action='store_true', help="skip arguments already in the checkpoint")
+    parser.add_argument('--compact-only', action='store_true',
+                        help="only merge the checkpoint into --output, without calling the model")
+    opts = parser.parse_args()
 
-print("Starting robust argument relation extraction...\n")
+    dataset = load_dataset(opts.input)
+    if opts.compact_only:
+        missing = compact(dataset, opts.checkpoint, opts.output)
+        print(f"Saved to {opts.output} ({missing} arguments without relations)")
+        raise SystemExit(0)
 
-for arg in arguments:
-    aid = arg['id']
-    print(f"Processing {aid}...", end=" ")
-    arg['relationships'] = extract_relations(aid)
-    time.sleep(0.5)
+    cache = None if opts.no_cache else RelationCache(opts.cache)
+    done = load_checkpoint(opts.checkpoint) if opts.resume else {}
+    checkpoint = Checkpoint(opts.checkpoint, resume=opts.resume)
 
+    print("Starting robust argument relation extraction...\n")
+    if done:
+        print(f"Resuming: {len(done)} arguments already in {opts.checkpoint}\n")
+    try:
+        extract_all(dataset['arguments'], workers=opts.workers, rate=opts.rate, max_retries=opts.max_retries,
+                    cache=cache, chunk_size=opts.chunk_size, prefilter_top=opts.prefilter_top,
+                    checkpoint=checkpoint, done=done)
+    finally:
+        checkpoint.close()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"\nCache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)")
+        cache.close()
 
-output_path = os.path.join(os.path.dirname(__file__), 'dataset_with_relations.json')
-with open(output_path, 'w', encoding='utf-8') as f:
-    json.dump(dataset, f, indent=4, ensure_ascii=False)
+    missing = compact(dataset, opts.checkpoint, opts.output)
+    if missing:
+        print(f"\n{missing} arguments failed; run again with --resume to retry them")
 
-print(f"\nDONE! Saved to {output_path}")
\ No newline at end of file
+    print(f"\nDONE! Saved to {opts.output}")
\ No newline at end of file
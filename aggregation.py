@@ -0,0 +1,108 @@
+from collections import namedtuple
+
+import numpy as np
+
+import vectorized as vec
+from instrumentation import no_lap
+from registry import DEFAULT_MODE, METHOD_SETS, Evaluation
+from sparse_graph import adjacency_from_index
+
+# Modes of the aggregation core (registry.py method sets):
+#   'fast'  - the 23 methods of aggregators.py; Kemeny and APREF approximated by Copeland on
+#             the in/out win matrix
+#   'exact' - the 20 methods of aggregators2.py; in > undec > out pairwise matrix, exact
+#             Kemeny-Young, Simpson DI and APREF
+MODES = tuple(METHOD_SETS)
+
+BEHAVIOR = {'in': 'Cooperative', 'out': 'Antagonistic', 'undec': 'Neutral'}
+
+AggregationResult = namedtuple('AggregationResult', [
+    'mode',
+    'labels',          # method -> {argument id: 'in' | 'out' | 'undec'}
+    'final_decision',  # meta decision on the root argument (Definitions 15 & 16)
+    'in_f', 'out_f', 'undec_f',  # methods labelling the root in / out / neither
+    'mild_status',     # method -> 'Mild' | 'Not Mild'
+    'behavior',        # method -> 'Cooperative' | 'Antagonistic' | 'Neutral' | 'N/A'
+    'in_counts', 'out_counts', 'undec_counts',  # argument id -> number of agents
+    'kemeny_optimal',  # False when the Kemeny ranking behind AKEMEN_D ran out of time (best
+                       # order found, not proven optimal); None when no method needed it
+])
+
+
+def meta_aggregate(labels, root='N'):
+    # Final decision over all methods' labels of `root`, and which methods agree with it
+    in_f = sum(1 for r in labels.values() if r.get(root) == 'in')
+    out_f = sum(1 for r in labels.values() if r.get(root) == 'out')
+    undec_f = len(labels) - in_f - out_f
+    final_decision = ('in' if in_f > out_f and in_f >= undec_f else
+                      'out' if out_f > in_f and out_f >= undec_f else
+                      'undec')
+    mild_status = {}
+    behavior = {}
+    for name, labeling in labels.items():
+        if labeling.get(root) == final_decision:
+            mild_status[name] = 'Mild'
+            behavior[name] = BEHAVIOR.get(final_decision, 'N/A')
+        else:
+            mild_status[name] = 'Not Mild'
+            behavior[name] = 'N/A'
+    return final_decision, in_f, out_f, undec_f, mild_status, behavior
+
+
+def _evaluation_order(registry, names):
+    # Intermediates needed by `names`, dependencies first
+    order = []
+    seen = set()
+
+    def visit(name):
+        if name not in seen:
+            seen.add(name)
+            for dep in registry.lookup_intermediate(name)[0]:
+                visit(dep)
+            order.append(name)
+    for name in names:
+        for dep in registry.methods[registry.resolve(name)][0]:
+            visit(dep)
+    return order
+
+
+def aggregate(labels, arg_ids, graph, mode=DEFAULT_MODE, methods=None, root='N', timer=None):
+    # labels: (agents, A) int8 matrix in vectorized.py's encoding; graph: SignedAdjacency.
+    # Every shared intermediate (counts, win/pairwise matrices, score vectors, Kemeny) is
+    # computed once and reused by all methods that need it. timer: an
+    # instrumentation.StageTimer, charged per intermediate, per method and for the meta vote.
+    lap = timer.start() if timer is not None else no_lap
+    registry = METHOD_SETS[mode]
+    names = registry.names() if methods is None else list(methods)
+    ev = Evaluation(registry, arg_ids, np.asarray(labels, dtype=np.int8), graph)
+    for name in _evaluation_order(registry, names):
+        ev.get(name)
+        lap(name)
+    results = {}
+    computed = {}
+    for name in names:
+        target = registry.resolve(name)
+        if target not in computed:
+            computed[target] = ev.labelling(registry.methods[target][1](ev))
+            lap(target)
+        results[name] = computed[target]
+    final_decision, in_f, out_f, undec_f, mild_status, behavior = meta_aggregate(results, root)
+    in_c, out_c, undec_c = ev.get('counts')
+    kemeny = ev.cache.get('kemeny')
+    lap('meta')
+    if timer is not None:
+        timer.finish()
+    return AggregationResult(mode, results, final_decision, in_f, out_f, undec_f, mild_status, behavior,
+                             vec.to_count_dict(ev.arg_ids, in_c), vec.to_count_dict(ev.arg_ids, out_c),
+                             vec.to_count_dict(ev.arg_ids, undec_c), kemeny.optimal if kemeny is not None else None)
+
+
+def aggregate_agents(agents, arg_ids, graph, mode=DEFAULT_MODE, methods=None, root='N', timer=None):
+    # Same, from the dataset's [{'id': ..., 'labels': {...}}] agent list
+    return aggregate(vec.encode_labels(agents, arg_ids), arg_ids, graph, mode, methods, root, timer)
+
+
+def aggregate_index(agents, arg_ids, attackers_of, defenders_of, mode=DEFAULT_MODE, adjacency=None, timer=None):
+    # Entry point for the attackers_of / defenders_of representation of the graph
+    graph = adjacency if adjacency is not None else adjacency_from_index(arg_ids, attackers_of, defenders_of)
+    return aggregate_agents(agents, arg_ids, graph, mode, timer=timer)
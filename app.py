@@ -1,47 +1,138 @@
 import streamlit as st
 import json
+import os
 import pandas as pd
-import networkx as nx
-import plotly.graph_objects as go
 from collections import defaultdict
 import base64
 import altair as alt
 import numpy as np
 from aggregators import compute_aggregations
+from sparse_graph import adjacency_from_arguments
+from incremental import AggregationState
+from ballot_profile import Profile
+import vectorized as vec
+from simulation import NOISE_MODELS, simulate
+from instrumentation import StageTimer
+from graph_render import argument_digraph, graph_figure, graph_layout, group_digraph
+from semantics import AttackGraph, check_labellings
 
 
-with open('dataset_with_relations.json', 'r', encoding='utf-8') as f:
-    dataset = json.load(f)
+DATASET_PATH = 'dataset_with_relations.json'
+PDF_PATH = '26_dec_Karimi_Collective_Argumentation_Based_on_Social_Choice_Methods.pdf'
+RESULTS_MEMO_SIZE = 32
+AGENT_PAGE_SIZES = [25, 50, 100, 250]
+
+
+def file_signature(path):
+    # Cache key part that changes whenever the file is rewritten
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# Everything derived from the files on disk is cached across reruns and sessions, keyed on
+# the file signature, so widget interactions only re-render.
+
+@st.cache_resource
+def load_dataset(path, signature):
+    # Parsed once per dataset version instead of unpickled on every rerun; shared, treat as
+    # read-only
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@st.cache_resource
+def relation_index(path, signature):
+    # attackers_of / defenders_of and the CSR adjacency; shared, treat as read-only
+    arguments = load_dataset(path, signature)['arguments']
+    attackers_of = defaultdict(set)
+    defenders_of = defaultdict(set)
+    for arg in arguments:
+        src = arg['id']
+        for target, rel in arg.get('relationships', {}).items():
+            if rel == 'attack':
+                attackers_of[target].add(src)
+            elif rel == 'defend':
+                defenders_of[target].add(src)
+    adjacency = adjacency_from_arguments(arguments, [arg['id'] for arg in arguments])
+    return attackers_of, defenders_of, adjacency
+
+
+@st.cache_resource
+def attack_graph(path, signature):
+    # Attack relation for the Dung legality checks; shared, treat as read-only
+    return AttackGraph.from_adjacency(relation_index(path, signature)[2])
+
+
+@st.cache_resource
+def argument_graph_figure(path, signature, collapse_groups=False):
+    # Graph, spring layout and batched-trace figure, built once per dataset version;
+    # shared, treat as read-only
+    arguments = load_dataset(path, signature)['arguments']
+    G = group_digraph(arguments) if collapse_groups else argument_digraph(arguments)
+    return graph_figure(G, graph_layout(G))
+
+
+@st.cache_data
+def encoded_pdf(path, signature):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+dataset_signature = file_signature(DATASET_PATH)
+dataset = load_dataset(DATASET_PATH, dataset_signature)
 
 arguments = dataset['arguments']
 original_agents = dataset['agents']
 arg_ids = [arg['id'] for arg in arguments]
 arg_by_id = {arg['id']: arg for arg in arguments}
 
+# Everything the session derived from the dataset is dropped when the file changes, so the
+# profile, the aggregation state and the memos below are rebuilt for the new arguments
+SESSION_DATASET_KEYS = ['simulated_agents', 'base_profile', 'profile', 'aggregation_state', 'changes_since',
+                        'results_memo', 'rationality_memo', 'monte_carlo']
+if st.session_state.get('dataset_signature') != dataset_signature:
+    for key in SESSION_DATASET_KEYS:
+        st.session_state.pop(key, None)
+    st.session_state['dataset_signature'] = dataset_signature
 
 if 'simulated_agents' not in st.session_state:
     st.session_state['simulated_agents'] = []
-if 'current_agents' not in st.session_state:
-    st.session_state['current_agents'] = original_agents.copy()
-if 'previous_labels' not in st.session_state:
-    st.session_state['previous_labels'] = {agent['id']: agent['labels'].copy() for agent in original_agents}
+# The dataset's profile is never modified; the dashboard works on a copy-on-write snapshot
+if 'base_profile' not in st.session_state:
+    st.session_state['base_profile'] = Profile.from_agents(original_agents, arg_ids)
+if 'profile' not in st.session_state:
+    st.session_state['profile'] = st.session_state['base_profile'].snapshot()
 
 
-attackers_of = defaultdict(set)
-defenders_of = defaultdict(set)
+attackers_of, defenders_of, adjacency = relation_index(DATASET_PATH, dataset_signature)
 
-for arg in arguments:
-    src = arg['id']
-    for target, rel in arg.get('relationships', {}).items():
-        if rel == 'attack':
-            attackers_of[target].add(src)
-        elif rel == 'defend':
-            defenders_of[target].add(src)
+# Counts and pairwise matrices are kept up to date agent by agent across reruns
+if 'aggregation_state' not in st.session_state:
+    st.session_state['aggregation_state'] = AggregationState(arg_ids, adjacency=adjacency,
+                                                             agents=st.session_state['profile'].to_agents())
+# Labels changed after this tick of the state's change clock are highlighted in the agents
+# table; every action that modifies the profile moves it to the tick just before its changes
+if 'changes_since' not in st.session_state:
+    st.session_state['changes_since'] = st.session_state['aggregation_state'].clock
+
+
+def profile_memo(name, build):
+    # Memoized on the profile, so reruns that leave the agents alone (and undoing a change) are free
+    memo = st.session_state.setdefault(name, {})
+    key = st.session_state['aggregation_state'].profile_key()
+    if key not in memo:
+        if len(memo) >= RESULTS_MEMO_SIZE:
+            memo.pop(next(iter(memo)))
+        memo[key] = build()
+    return memo[key]
 
 
 def compute_results(agents_override=None):
-    temp_agents = agents_override or st.session_state['current_agents']
-    return compute_aggregations(temp_agents, arguments, arg_ids, attackers_of, defenders_of)
+    # Full recompute only for an explicit agent list; otherwise read the incremental state
+    if agents_override is not None:
+        return compute_aggregations(agents_override, arguments, arg_ids, attackers_of, defenders_of,
+                                    adjacency=adjacency)
+    return profile_memo('results_memo', st.session_state['aggregation_state'].results)
 
 
 results, final_decision, in_f, out_f, undec_f, current_in_counts, current_out_counts, current_undec_counts, mild_status, behavior = compute_results()
@@ -78,22 +169,60 @@ with st.sidebar:
         sim_labels[aid] = st.selectbox(f"Label for {aid}", ['in', 'out', 'undec'], key=f"sim_{aid}_{len(st.session_state['simulated_agents'])}")
     if st.button("Add Agent"):
         new_agent = {"id": sim_agent_id, "labels": sim_labels}
-        st.session_state['simulated_agents'].append(new_agent)
-        st.session_state['current_agents'] = original_agents + st.session_state['simulated_agents']
-        results, final_decision, in_f, out_f, undec_f, current_in_counts, current_out_counts, current_undec_counts, mild_status, behavior = compute_results(st.session_state['current_agents'])
-        st.success(f"Agent '{sim_agent_id}' added!")
-        st.rerun()  # Refresh to update highlight options
+        st.session_state['changes_since'] = st.session_state['aggregation_state'].clock
+        try:
+            st.session_state['aggregation_state'].add_agent(new_agent)
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            st.session_state['simulated_agents'].append(new_agent)
+            st.session_state['profile'].add_agent(new_agent)
+            results, final_decision, in_f, out_f, undec_f, current_in_counts, current_out_counts, current_undec_counts, mild_status, behavior = compute_results()
+            st.success(f"Agent '{sim_agent_id}' added!")
+            st.rerun()  # Refresh to update highlight options
 
     if st.button("Clear Simulated Agents"):
+        state = st.session_state['aggregation_state']
+        st.session_state['changes_since'] = state.clock
+        for agent in st.session_state['simulated_agents']:
+            state.remove_agent(agent['id'])
+        # Original agents go back to their dataset labels (a random simulation may have changed them)
+        base_profile = st.session_state['base_profile']
+        state.replace_labels(base_profile.agent_ids, base_profile.labels)
         st.session_state['simulated_agents'] = []
-        st.session_state['current_agents'] = original_agents.copy()
+        st.session_state['profile'] = base_profile.snapshot()
         results, final_decision, in_f, out_f, undec_f, current_in_counts, current_out_counts, current_undec_counts, mild_status, behavior = compute_results()
         st.success("Simulated agents cleared!")
         st.rerun()
 
+    st.subheader("Monte Carlo Simulation")
+    mc_profiles = st.number_input("Profiles", min_value=100, max_value=1_000_000, value=10_000, step=1000)
+    mc_noise = st.selectbox("Noise model", list(NOISE_MODELS), help="flip: perturb the current labels; "
+                                                                   "uniform: draw every label at random")
+    mc_p = st.slider("Flip probability", 0.0, 1.0, 0.1, disabled=mc_noise != 'flip')
+    mc_seed = st.number_input("Seed", min_value=0, value=42, step=1)
+    if st.button("Run Monte Carlo"):
+        with st.spinner("Simulating..."):
+            st.session_state['monte_carlo'] = simulate(st.session_state['profile'].labels, arg_ids, adjacency,
+                                                       int(mc_profiles), noise=mc_noise, p=mc_p,
+                                                       seed=int(mc_seed), mode='fast')
+
     results_json = json.dumps(results, indent=4)
     st.download_button("Download Results JSON", results_json, file_name="aggregation_results.json")
 
+    # Full recompute of the current profile with a stage timer; nothing is timed while unchecked
+    if st.checkbox("Show timing panel"):
+        timer = StageTimer(memory=True)
+        compute_aggregations(st.session_state['profile'].to_agents(), arguments, arg_ids, attackers_of, defenders_of,
+                             adjacency=adjacency, timer=timer)
+        report = timer.report()
+        st.caption(f"compute_aggregations: {report['total_seconds'] * 1e3:.2f} ms")
+        timing_df = pd.DataFrame(report['stages']).set_index('stage')
+        timing_df['ms'] = timing_df['seconds'] * 1e3
+        timing_df['KiB'] = timing_df['peak_bytes'] / 1024
+        st.dataframe(timing_df[['ms', 'share', 'KiB']].style.format({'ms': '{:.3f}', 'share': '{:.0%}',
+                                                                    'KiB': '{:.1f}'}))
+
 
 st.title("🗣️ Collective Argumentation Dashboard")
 st.markdown(f'<p class="big-font">Goal: {dataset["goal"]}</p>', unsafe_allow_html=True)
@@ -119,53 +248,45 @@ with col2:
 
 
 st.markdown('<p class="section-header">Agents & Labels</p>', unsafe_allow_html=True)
+# Filtering runs over agent ids and version counters only; HTML is built for one page
+state = st.session_state['aggregation_state']
+changes_since = st.session_state['changes_since']
+filter_col, changed_col, size_col = st.columns([2, 1, 1])
+id_prefix = filter_col.text_input("Agent ID starts with", key='agent_id_prefix')
+changed_only = changed_col.checkbox("Changed only", key='agent_changed_only')
+page_size = size_col.selectbox("Rows per page", AGENT_PAGE_SIZES, key='agent_page_size')
+
+
+def is_simulated(agent_id):
+    return agent_id.startswith('SimAgent')
+
+
+profile = st.session_state['profile']
+shown_agents = [agent_id for agent_id in profile.agent_ids
+                if agent_id.startswith(id_prefix)
+                and (not changed_only or is_simulated(agent_id) or state.versions[agent_id] > changes_since)]
+n_pages = max(1, -(-len(shown_agents) // page_size))
+page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+
 agent_data = []
-for agent in st.session_state['current_agents']:
-    row = {'Agent ID': agent['id']}
-    is_new = agent['id'].startswith('SimAgent')
-    prev_labels = st.session_state['previous_labels'].get(agent['id'], {})
-    for aid, label in agent['labels'].items():
+for agent_id in shown_agents[(page - 1) * page_size:page * page_size]:
+    row = {'Agent ID': agent_id}
+    changed = set(arg_ids) if is_simulated(agent_id) else state.changed_since(agent_id, changes_since)
+    for aid, label in profile.agent_labels(agent_id).items():
         color_class = 'label-in' if label == 'in' else 'label-out' if label == 'out' else 'label-undec'
-        if is_new or label != prev_labels.get(aid):
+        if aid in changed:
             row[aid] = f'<span class="{color_class} changed-label">{label}</span>'  # Highlight new/changed
         else:
             row[aid] = f'<span class="{color_class}">{label}</span>'
     agent_data.append(row)
 agent_df = pd.DataFrame(agent_data)
 st.markdown(agent_df.to_html(escape=False), unsafe_allow_html=True)
-
-
-st.session_state['previous_labels'] = {agent['id']: agent['labels'].copy() for agent in st.session_state['current_agents']}
+st.caption(f"{len(shown_agents)} of {len(profile)} agents")
 
 
 st.markdown('<p class="section-header">Argumentation Graph</p>', unsafe_allow_html=True)
-G = nx.DiGraph()
-for arg in arguments:
-    G.add_node(arg['id'], label=arg['id'] + ": " + arg['text'][:20] + "...")
-for src_arg in arguments:
-    for target, rel in src_arg.get('relationships', {}).items():
-        dash = 'solid' if rel == 'attack' else 'dot'  # Solid for attack, dotted for defend
-        G.add_edge(src_arg['id'], target, dash=dash, relation=rel)
-
-pos = nx.spring_layout(G, seed=42)
-edge_traces = []
-for edge in G.edges(data=True):
-    x0, y0 = pos[edge[0]]
-    x1, y1 = pos[edge[1]]
-    edge_traces.append(go.Scatter(x=[x0, x1, None], y=[y0, y1, None],
-                                  line=dict(width=2, color='black', dash=edge[2]['dash']),
-                                  hoverinfo='text', text=f"{edge[0]} {edge[2]['relation']} {edge[1]}",
-                                  mode='lines'))
-
-node_trace = go.Scatter(x=[pos[node][0] for node in G.nodes()],
-                        y=[pos[node][1] for node in G.nodes()],
-                        text=[G.nodes[node]['label'] for node in G.nodes()],
-                        mode='markers+text',
-                        marker=dict(size=25, color='#1f77b4', line=dict(width=2, color='DarkSlateGrey')),
-                        hoverinfo='text')
-
-fig = go.Figure(data=edge_traces + [node_trace],
-                layout=go.Layout(showlegend=False, hovermode='closest', title='Interactive Argumentation Graph'))
+collapse_groups = st.checkbox("Collapse arguments by group", value=len(arguments) > 500)
+fig = argument_graph_figure(DATASET_PATH, dataset_signature, collapse_groups)
 st.plotly_chart(fig, use_container_width=True)
 
 # --- Aggregation Results ---
@@ -189,33 +310,48 @@ results_df = pd.DataFrame(results).T
 results_df['Method'] = results_df.index
 results_df['Mild'] = [mild_status.get(method, 'N/A') for method in results_df['Method']]
 results_df['Behavior'] = [behavior.get(method, 'N/A') for method in results_df['Method']]
+# Whether each method's collective labelling is a legal Dung labelling of the attack graph
+rationality = profile_memo('rationality_memo',
+                           lambda: check_labellings(attack_graph(DATASET_PATH, dataset_signature), results))
+results_df['Admissible'] = [rationality[method]['admissible'] for method in results_df['Method']]
+results_df['Complete'] = [rationality[method]['complete'] for method in results_df['Method']]
 results_df = results_df.set_index('Method').reindex(preferred_order).reset_index()
 
 highlight = results_df.style.apply(
     lambda row: ['background-color: #ffeb3b' if row.Method == selected_method else '' for _ in row], axis=1)
 st.dataframe(highlight, use_container_width=True)
 
+if 'monte_carlo' in st.session_state:
+    summary = st.session_state['monte_carlo']
+    st.markdown('<p class="section-header">Monte Carlo Outcome Distribution for N</p>', unsafe_allow_html=True)
+    st.markdown(f"{summary.n_profiles} profiles; final decision: " +
+                ", ".join(f"{label} {share:.1%}" for label, share in summary.final_frequencies.items()))
+    mc_df = pd.DataFrame(summary.frequencies).T
+    mc_df['Agreement with final'] = pd.Series(summary.agreement)
+    st.dataframe(mc_df.reindex(preferred_order).style.format('{:.1%}'), use_container_width=True)
+    st.dataframe(pd.DataFrame(summary.pairwise_agreement, index=summary.methods, columns=summary.methods)
+                 .style.format('{:.0%}'), use_container_width=True)
+
 
 st.markdown('<p class="section-header">Related Paper PDF</p>', unsafe_allow_html=True)
 
 
 def display_pdf(file_path):
-    with open(file_path, "rb") as f:
-        base64_pdf = base64.b64encode(f.read()).decode('utf-8')
+    base64_pdf = encoded_pdf(file_path, file_signature(file_path))
     pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="600" type="application/pdf"></iframe>'
     st.markdown(pdf_display, unsafe_allow_html=True)
 
 
-display_pdf('26_dec_Karimi_Collective_Argumentation_Based_on_Social_Choice_Methods.pdf')
+display_pdf(PDF_PATH)
 
 
 if st.button("Run Random Simulation"):
-    prev_labels = {agent['id']: agent['labels'].copy() for agent in st.session_state['current_agents']}
-    for agent in st.session_state['current_agents']:
-        for aid in arg_ids:
-            agent['labels'][aid] = np.random.choice(['in', 'out', 'undec'])
-    results, final_decision, in_f, out_f, undec_f, current_in_counts, current_out_counts, current_undec_counts, mild_status, behavior = compute_results(st.session_state['current_agents'])
-
-    st.session_state['previous_labels'] = prev_labels
+    state = st.session_state['aggregation_state']
+    profile = st.session_state['profile']
+    st.session_state['changes_since'] = state.clock
+    profile.set_labels(np.random.default_rng().integers(vec.OUT, vec.IN + 1, size=profile.labels.shape))
+    # One block update of the changed ballots; cell-by-cell updates are far slower here
+    state.replace_labels(profile.agent_ids, profile.labels)
+    results, final_decision, in_f, out_f, undec_f, current_in_counts, current_out_counts, current_undec_counts, mild_status, behavior = compute_results()
     st.info("Random simulation applied! Labels randomized; check highlighted changes in Agents table.")
     st.rerun()
\ No newline at end of file
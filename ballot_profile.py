@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+
+import vectorized as vec
+
+
+class Profile:
+    # Agents' labellings as one (agents, A) int8 matrix in vectorized.py's encoding
+    # (in=1, undec=0, out=-1): one byte per label instead of a dict of strings per agent.
+    # snapshot() shares the matrix (only the id list is copied); whichever side writes first
+    # copies it.
+    __slots__ = ('agent_ids', 'agent_index', 'arg_ids', 'arg_index', '_labels', '_shared')
+
+    def __init__(self, agent_ids, arg_ids, labels):
+        self.agent_ids = list(agent_ids)
+        self.agent_index = {aid: i for i, aid in enumerate(self.agent_ids)}
+        if len(self.agent_index) != len(self.agent_ids):
+            raise ValueError("Duplicate agent ids in profile")
+        self.arg_ids = list(arg_ids)
+        self.arg_index = {aid: j for j, aid in enumerate(self.arg_ids)}
+        labels = np.asarray(labels, dtype=np.int8).reshape(len(self.agent_ids), len(self.arg_ids))
+        self._labels = labels
+        self._shared = False
+
+    @classmethod
+    def shared(cls, agent_ids, arg_ids, labels):
+        # Wrap a label matrix owned elsewhere (e.g. a read-only memmap); copied on first write
+        profile = cls(agent_ids, arg_ids, labels)
+        profile._shared = True
+        return profile
+
+    @classmethod
+    def from_agents(cls, agents, arg_ids):
+        # From the dataset's [{'id': ..., 'labels': {arg id: label}}] list (missing labels: undec)
+        return cls([agent['id'] for agent in agents], arg_ids, vec.encode_labels(agents, arg_ids))
+
+    def to_agents(self):
+        return [{'id': agent_id, 'labels': vec.labels_to_dict(row, self.arg_ids)}
+                for agent_id, row in zip(self.agent_ids, self._labels)]
+
+    # --- Read access ---
+
+    def __len__(self):
+        return len(self.agent_ids)
+
+    def __contains__(self, agent_id):
+        return agent_id in self.agent_index
+
+    @property
+    def labels(self):
+        # Read-only view; change labels through set_label/set_row
+        view = self._labels.view()
+        view.flags.writeable = False
+        return view
+
+    def label(self, agent_id, aid):
+        return vec.CODE_LABELS[int(self._labels[self.agent_index[agent_id], self.arg_index[aid]])]
+
+    def agent_labels(self, agent_id):
+        return vec.labels_to_dict(self._labels[self.agent_index[agent_id]], self.arg_ids)
+
+    # --- Copy-on-write ---
+
+    def snapshot(self):
+        other = Profile.__new__(Profile)
+        other.agent_ids = list(self.agent_ids)
+        other.agent_index = dict(self.agent_index)
+        other.arg_ids = self.arg_ids
+        other.arg_index = self.arg_index
+        other._labels = self._labels
+        other._shared = self._shared = True
+        return other
+
+    def _writable(self):
+        if self._shared:
+            self._labels = self._labels.copy()
+            self._shared = False
+        return self._labels
+
+    # --- Updates ---
+
+    def set_label(self, agent_id, aid, label):
+        self._writable()[self.agent_index[agent_id], self.arg_index[aid]] = vec.LABEL_CODES.get(label, vec.UNDEC)
+
+    def set_row(self, agent_id, codes):
+        self._writable()[self.agent_index[agent_id]] = codes
+
+    def set_labels(self, codes):
+        # Replace the whole (agents, A) matrix of codes
+        codes = np.asarray(codes, dtype=np.int8)
+        if codes.shape != self._labels.shape:
+            raise ValueError(f"Expected labels of shape {self._labels.shape}, got {codes.shape}")
+        self._labels = codes.copy()
+        self._shared = False
+
+    def add_agent(self, agent):
+        if agent['id'] in self.agent_index:
+            raise ValueError(f"Agent '{agent['id']}' is already part of the profile")
+        row = vec.encode_labels([agent], self.arg_ids)
+        self._labels = np.concatenate([self._labels, row])
+        self._shared = False
+        self.agent_index[agent['id']] = len(self.agent_ids)
+        self.agent_ids.append(agent['id'])
+
+    def remove_agent(self, agent_id):
+        i = self.agent_index.pop(agent_id)
+        self._labels = np.delete(self._labels, i, axis=0)
+        self._shared = False
+        del self.agent_ids[i]
+        for j, other in enumerate(self.agent_ids[i:], start=i):
+            self.agent_index[other] = j
+
+
+def load_profile(path):
+    # Profile of the agents in a dataset JSON file (dataset.json / dataset_with_relations.json)
+    with open(path, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    return Profile.from_agents(dataset['agents'], [arg['id'] for arg in dataset['arguments']])
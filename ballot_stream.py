@@ -0,0 +1,183 @@
+import json
+from itertools import islice
+
+import numpy as np
+
+import bitpacked as bp
+import vectorized as vec
+from registry import DEFAULT_MODE, METHOD_SETS, Evaluation
+
+# Ballots encoded and folded together; bounds the (chunk, A) buffers
+DEFAULT_CHUNK = 10_000
+# Characters read from disk at a time by the incremental JSON reader
+READ_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+
+
+class BallotStatistics:
+    # Everything the aggregation methods need from a profile: the agent count, in/out counts
+    # and the in/out-wins and pairwise matrices. O(A^2) memory whatever the number of agents.
+
+    def __init__(self, arg_ids):
+        self.arg_ids = list(arg_ids)
+        n = len(self.arg_ids)
+        self.n_agents = 0
+        self.in_c = np.zeros(n, dtype=np.int64)
+        self.out_c = np.zeros(n, dtype=np.int64)
+        self.wins = np.zeros((n, n), dtype=np.int64)
+        self.pairwise = np.zeros((n, n), dtype=np.int64)
+
+    @property
+    def undec_c(self):
+        return self.n_agents - self.in_c - self.out_c
+
+    def add_labels(self, L):
+        # Fold a (ballots, A) int8 block in vectorized.py's encoding
+        in_c, out_c, _ = vec.vote_counts(L)
+        self.n_agents += L.shape[0]
+        self.in_c += in_c
+        self.out_c += out_c
+        wins, pairwise = bp.pairwise_counts(L)
+        self.wins += wins
+        self.pairwise += pairwise
+
+    def add_agents(self, agents, chunk_size=DEFAULT_CHUNK):
+        # Fold any iterable of {'id', 'labels'} dicts, holding at most chunk_size at once
+        agents = iter(agents)
+        while True:
+            chunk = list(islice(agents, chunk_size))
+            if not chunk:
+                return self
+            self.add_labels(vec.encode_labels(chunk, self.arg_ids))
+
+    def evaluation(self, registry, graph):
+        return Evaluation.from_statistics(registry, self.arg_ids, self.n_agents, self.in_c, self.out_c,
+                                          self.wins, self.pairwise, graph)
+
+    def evaluate(self, graph, mode=DEFAULT_MODE, methods=None):
+        # Labellings of the requested methods (registry.py method sets) on the folded profile
+        registry = METHOD_SETS[mode]
+        return registry.evaluate(self.evaluation(registry, graph), methods)
+
+
+# --- Ballot readers: yield one agent dict at a time ---
+
+def iter_jsonl_agents(path):
+    # One agent ({"id": ..., "labels": {...}}) per line; blank lines are skipped
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class _Reader:
+    # Incremental JSON tokens over a file: a sliding buffer that is refilled on demand
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+
+    def _fill(self):
+        chunk = self.f.read(READ_SIZE)
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return bool(chunk)
+
+    def peek(self):
+        # Next non-whitespace character ('' at end of file)
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON stream, found '{self.peek()}'")
+        self.pos += 1
+
+    def value(self):
+        # Decode one complete JSON value, reading more input until it parses
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number could continue in the next chunk
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(reader):
+    reader.expect('[')
+    while reader.peek() != ']':
+        yield reader.value()
+        if reader.peek() == ',':
+            reader.pos += 1
+    reader.expect(']')
+
+
+def iter_json_array(path, key):
+    # Elements of the top-level array `key` of a JSON object file, decoded one at a time.
+    # Other top-level arrays are skipped element by element, other values decoded and dropped.
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = _Reader(f)
+        reader.expect('{')
+        while reader.peek() != '}':
+            name = reader.value()
+            reader.expect(':')
+            if name == key:
+                yield from _iter_array(reader)
+            elif reader.peek() == '[':
+                for _ in _iter_array(reader):
+                    pass
+            else:
+                reader.value()
+            if reader.peek() == ',':
+                reader.pos += 1
+
+
+def iter_json_agents(path):
+    return iter_json_array(path, 'agents')
+
+
+def iter_agents(path):
+    # .jsonl / .ndjson: one agent per line; anything else: a dataset JSON object
+    if path.endswith(('.jsonl', '.ndjson')):
+        return iter_jsonl_agents(path)
+    return iter_json_agents(path)
+
+
+def fold_ballots(path, arg_ids, chunk_size=DEFAULT_CHUNK):
+    return BallotStatistics(arg_ids).add_agents(iter_agents(path), chunk_size)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from sparse_graph import adjacency_from_arguments
+
+    parser = argparse.ArgumentParser(description="Aggregate a ballot file too large to load at once.")
+    parser.add_argument('ballots', help=".jsonl (one agent per line) or a dataset JSON file")
+    parser.add_argument('--dataset', default='dataset_with_relations.json', help="arguments and relations")
+    parser.add_argument('--mode', choices=list(METHOD_SETS), default=DEFAULT_MODE)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK)
+    opts = parser.parse_args()
+
+    arguments = list(iter_json_array(opts.dataset, 'arguments'))
+    arg_ids = [a['id'] for a in arguments]
+    stats = fold_ballots(opts.ballots, arg_ids, opts.chunk_size)
+    res = stats.evaluate(adjacency_from_arguments(arguments, arg_ids), opts.mode)
+
+    print(f"=== {stats.n_agents} ballots ===\n")
+    print(f"{'METHOD':<20} {'N':<6}")
+    print("-" * 30)
+    for name, labeling in res.items():
+        print(f"{name:<20} {labeling.get('N', '-'):<6}")
@@ -0,0 +1,70 @@
+import time
+import warnings
+
+import numpy as np
+
+import vectorized as vec
+from kemeny import DEFAULT_TIME_LIMIT, kemeny_winners_batch
+from registry import DEFAULT_MODE, METHOD_SETS, INTERMEDIATES, Evaluation, MethodRegistry
+
+# Scenarios processed together; bounds the (chunk, agents, A) float buffers of the matmuls
+DEFAULT_CHUNK = 4096
+
+# The registry.py method sets run as they are, since their rules broadcast over the scenario
+# axis; only the Kemeny winner is batched, instead of one KemenyResult per scenario
+BATCH_INTERMEDIATES = MethodRegistry(INTERMEDIATES)
+# Seeded by aggregate_batch, so that all its chunks share one time limit
+BATCH_INTERMEDIATES.intermediate('kemeny_deadline', lambda ev: time.perf_counter() + DEFAULT_TIME_LIMIT)
+# (winners, proven optimal) per scenario
+BATCH_INTERMEDIATES.intermediate('kemeny_batch', lambda ev: kemeny_winners_batch(
+    ev.get('pairwise'), deadline=ev.get('kemeny_deadline')), needs=('pairwise', 'kemeny_deadline'))
+BATCH_INTERMEDIATES.intermediate('kemeny_winner', lambda ev: ev.get('kemeny_batch')[0], needs=('kemeny_batch',))
+
+
+def stack_profiles(profiles, arg_ids):
+    # List of agent lists (same number of agents each) -> (scenarios, agents, A) int8 array
+    return np.stack([vec.encode_labels(agents, arg_ids) for agents in profiles])
+
+
+def meta_decision(labels, n_index):
+    # Per-scenario final decision on argument `n_index` over all methods (Definitions 15 & 16)
+    votes = np.stack([codes[:, n_index] for codes in labels.values()])
+    in_f = np.count_nonzero(votes == vec.IN, axis=0)
+    out_f = np.count_nonzero(votes == vec.OUT, axis=0)
+    undec_f = len(labels) - in_f - out_f
+    final = np.where((in_f > out_f) & (in_f >= undec_f), vec.IN,
+                     np.where((out_f > in_f) & (out_f >= undec_f), vec.OUT, vec.UNDEC)).astype(np.int8)
+    return final, in_f, out_f, undec_f
+
+
+def aggregate_batch(labels, arg_ids, graph, mode=DEFAULT_MODE, methods=None, root='N', chunk_size=DEFAULT_CHUNK,
+                    time_limit=DEFAULT_TIME_LIMIT):
+    # labels: int8 array (scenarios, agents, A) in vectorized.py's encoding, one shared graph.
+    # Returns (method -> (scenarios, A) int8 codes, final decision, in_f, out_f, undec_f, mild,
+    # kemeny_optimal), where final .. undec_f are per-scenario arrays, mild maps method -> bool
+    # array and kemeny_optimal is a per-scenario bool array (False: the Kemeny ranking behind
+    # AKEMEN_D ran out of time), None when no method needed it. `time_limit` seconds are
+    # shared by the Kemeny rankings of all scenarios. Meta aggregation is over the requested
+    # methods only.
+    labels = np.asarray(labels, dtype=np.int8)
+    method_set = METHOD_SETS[mode]
+    names = method_set.names() if methods is None else list(methods)
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    chunks = []
+    proven = []
+    for start in range(0, max(labels.shape[0], 1), chunk_size):
+        ev = Evaluation(BATCH_INTERMEDIATES, arg_ids, labels[start:start + chunk_size], graph)
+        ev.cache['kemeny_deadline'] = deadline
+        chunks.append(method_set.codes(ev, names))
+        if 'kemeny_batch' in ev.cache:
+            proven.append(ev.cache['kemeny_batch'][1])
+    out = {name: np.concatenate([c[name] for c in chunks]) for name in names}
+    kemeny_optimal = np.concatenate(proven) if proven else None
+    if kemeny_optimal is not None and not kemeny_optimal.all():
+        warnings.warn(f"Kemeny-Young search hit its time limit in {np.count_nonzero(~kemeny_optimal)} of "
+                      f"{kemeny_optimal.size} scenarios: AKEMEN_D uses the best ranking found there, which "
+                      "is not proven optimal", RuntimeWarning, stacklevel=2)
+    n_index = list(arg_ids).index(root)
+    final, in_f, out_f, undec_f = meta_decision(out, n_index)
+    mild = {name: codes[:, n_index] == final for name, codes in out.items()}
+    return out, final, in_f, out_f, undec_f, mild, kemeny_optimal
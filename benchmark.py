@@ -0,0 +1,204 @@
+import argparse
+import json
+import math
+import platform
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+
+import aggregators
+import aggregators2
+import vectorized as vec
+from aggregation import aggregate_agents
+from registry import METHOD_SETS, Evaluation
+from sparse_graph import adjacency_from_arguments
+
+
+# --- Synthetic debates ---
+
+def synthetic_debate(n_args, n_agents, density=0.2, skew=0.0, seed=0):
+    # Arguments N, a1, ..., a{n_args-1}; each ordered pair gets an attack or defend edge with
+    # probability `density`. Labels are 'in' with probability (1 + skew) / 3, 'out' with
+    # (1 - skew) / 3 and 'undec' with 1/3, so skew in [-1, 1] moves mass between in and out.
+    rng = np.random.default_rng(seed)
+    arg_ids = ['N'] + [f'a{i}' for i in range(1, n_args)]
+    edges = rng.random((n_args, n_args)) < density
+    np.fill_diagonal(edges, False)
+    attack = rng.random((n_args, n_args)) < 0.5
+    arguments = []
+    for s, aid in enumerate(arg_ids):
+        relationships = {arg_ids[t]: 'attack' if attack[s, t] else 'defend' for t in np.flatnonzero(edges[s])}
+        arguments.append({'id': aid, 'text': f"Synthetic argument {aid}", 'relationships': relationships})
+    probs = [(1 + skew) / 3, 1 / 3, (1 - skew) / 3]  # in, undec, out
+    codes = rng.choice([vec.IN, vec.UNDEC, vec.OUT], size=(n_agents, n_args), p=probs)
+    agents = [{'id': f'agent{i}', 'labels': vec.labels_to_dict(row, arg_ids)} for i, row in enumerate(codes)]
+    return arguments, agents
+
+
+def relation_index(arguments):
+    attackers_of = defaultdict(set)
+    defenders_of = defaultdict(set)
+    for arg in arguments:
+        for target, rel in arg.get('relationships', {}).items():
+            if rel == 'attack':
+                attackers_of[target].add(arg['id'])
+            elif rel == 'defend':
+                defenders_of[target].add(arg['id'])
+    return attackers_of, defenders_of
+
+
+# --- Measurement ---
+
+def _time(fn, repeat):
+    # Best of `repeat` wall-clock runs, in seconds
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_bytes(fn):
+    # Peak Python/numpy allocation of one run (a separate run: tracemalloc slows timing down)
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# name -> fn(agents, arguments, arg_ids, attackers_of, defenders_of, graph); the legacy entry
+# points rebuild the graph from the attackers/defenders sets on every call, as callers do
+ENGINES = {
+    'aggregators': lambda ag, args, ids, att, dfn, graph: aggregators.compute_aggregations(ag, args, ids, att, dfn),
+    'aggregators2': lambda ag, args, ids, att, dfn, graph: aggregators2.compute_aggregations(ag, args, ids, att, dfn),
+    'core.fast': lambda ag, args, ids, att, dfn, graph: aggregate_agents(ag, ids, graph, 'fast'),
+    'core.exact': lambda ag, args, ids, att, dfn, graph: aggregate_agents(ag, ids, graph, 'exact'),
+}
+
+
+def bench_engines(arguments, agents, engines, repeat):
+    arg_ids = [arg['id'] for arg in arguments]
+    attackers_of, defenders_of = relation_index(arguments)
+    graph = adjacency_from_arguments(arguments, arg_ids)
+    records = []
+    for name in engines:
+        compute = ENGINES[name]
+
+        def run():
+            compute(agents, arguments, arg_ids, attackers_of, defenders_of, graph)
+        records.append({'kind': 'engine', 'name': name, 'seconds': _time(run, repeat), 'peak_bytes': _peak_bytes(run)})
+    return records
+
+
+def bench_registry(arguments, agents, mode, repeat):
+    # Each intermediate and method timed on its own: its dependencies are computed beforehand
+    # and copied into a fresh Evaluation, so only its own work is measured
+    arg_ids = [arg['id'] for arg in arguments]
+    graph = adjacency_from_arguments(arguments, arg_ids)
+    registry = METHOD_SETS[mode]
+    labels = vec.encode_labels(agents, arg_ids)
+    full = Evaluation(registry, arg_ids, labels, graph)
+    for name in registry.requirements():
+        full.get(name)
+
+    def fresh(names):
+        ev = Evaluation(registry, arg_ids, labels, graph)
+        ev.cache.update({n: full.cache[n] for n in names})
+        return ev
+
+    records = [{'kind': 'encode', 'name': 'encode_labels', 'seconds': _time(lambda: vec.encode_labels(agents, arg_ids),
+                                                                          repeat)}]
+    for name in sorted(registry.requirements()):
+        needs, fn = registry.lookup_intermediate(name)
+        records.append({'kind': 'intermediate', 'name': name, 'mode': mode,
+                        'seconds': _time(lambda: fn(fresh(needs)), repeat)})
+    for name in registry.names():
+        target = registry.resolve(name)
+        needs, fn = registry.methods[target]
+        records.append({'kind': 'method', 'name': name, 'mode': mode, 'alias_of': None if target == name else target,
+                        'seconds': _time(lambda: fn(fresh(registry.requirements([name]))), repeat),
+                        'seconds_with_intermediates': _time(lambda: registry.evaluate(fresh(()), [name]), repeat)})
+    return records
+
+
+def scaling_exponents(records, axis):
+    # Least-squares slope of log(seconds) against log(axis) per engine/intermediate/method,
+    # with the other size parameters fixed to their first value
+    series = defaultdict(list)
+    for r in records:
+        key = (r['kind'], r['name'], r.get('mode'))
+        series[key].append((r['params'][axis], r['seconds'], r['params']))
+    exponents = {}
+    for key, points in series.items():
+        fixed = {k: v for k, v in points[0][2].items() if k != axis}
+        points = [(x, s) for x, s, p in points if all(p[k] == v for k, v in fixed.items()) and s > 0]
+        if len({x for x, _ in points}) > 1:
+            xs, ys = zip(*points)
+            exponents['/'.join(str(k) for k in key if k)] = float(np.polyfit(np.log(xs), np.log(ys), 1)[0])
+    return exponents
+
+
+def run_suite(arg_counts, agent_counts, densities, skews, engines, modes, repeat, seed):
+    records = []
+    for n_args in arg_counts:
+        for n_agents in agent_counts:
+            for density in densities:
+                for skew in skews:
+                    params = {'n_args': n_args, 'n_agents': n_agents, 'density': density, 'skew': skew}
+                    arguments, agents = synthetic_debate(n_args, n_agents, density, skew, seed)
+                    found = bench_engines(arguments, agents, engines, repeat)
+                    for mode in modes:
+                        found += bench_registry(arguments, agents, mode, repeat)
+                    for r in found:
+                        r['params'] = params
+                    records += found
+                    print(f"{params}: " + ", ".join(f"{r['name']} {r['seconds'] * 1e3:.2f} ms"
+                                                    for r in found if r['kind'] == 'engine'))
+    return records
+
+
+def _ints(text):
+    return [int(x) for x in text.split(',')]
+
+
+def _floats(text):
+    return [float(x) for x in text.split(',')]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the aggregation engines, intermediates and methods.")
+    parser.add_argument('--args', type=_ints, default=[5, 10, 20], help="argument counts, comma-separated")
+    parser.add_argument('--agents', type=_ints, default=[10, 100, 1000], help="agent counts, comma-separated")
+    parser.add_argument('--density', type=_floats, default=[0.2], help="edge densities, comma-separated")
+    parser.add_argument('--skew', type=_floats, default=[0.0], help="label skews in [-1, 1], comma-separated")
+    parser.add_argument('--engines', default=','.join(ENGINES), help="subset of: " + ', '.join(ENGINES))
+    parser.add_argument('--modes', default='fast,exact', help="registry method sets to time per method")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    opts = parser.parse_args()
+
+    engines = [e for e in opts.engines.split(',') if e]
+    modes = [v for v in opts.modes.split(',') if v]
+    records = run_suite(opts.args, opts.agents, opts.density, opts.skew, engines, modes, opts.repeat, opts.seed)
+    report = {
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine()},
+        'config': {'args': opts.args, 'agents': opts.agents, 'density': opts.density, 'skew': opts.skew,
+                   'engines': engines, 'modes': modes, 'repeat': opts.repeat, 'seed': opts.seed},
+        'scaling': {axis: scaling_exponents(records, axis) for axis in ('n_args', 'n_agents')},
+        'records': records,
+    }
+    with open(opts.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print("\nScaling exponents (seconds ~ size^k), engines:")
+    for axis, exponents in report['scaling'].items():
+        for name, k in exponents.items():
+            if name.startswith('engine/'):
+                print(f"  {name:<28} {axis:<9} k = {k:.2f}")
+    print(f"\nSaved {len(records)} measurements to {opts.output}")
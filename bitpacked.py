@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import vectorized as vec
+
+# Pairwise counts from bit-packed ballots. Each argument's column of the (agents, A) label
+# matrix becomes three bitsets over agents (in / undec / out, 64 agents per word), and every
+# count is a popcount of an AND:
+#   wins[i, j]     = |in_i & out_j|
+#   pairwise[i, j] = |in_i & ~in_j| + |undec_i & out_j| = in_c[i] - |in_i & in_j| + |undec_i & out_j|
+# That is 1 bit per agent and label instead of the 8-byte floats of vectorized.py's BLAS
+# products, which is what bounds memory (and bandwidth) for electorates of 10^6 and more.
+
+# Agents per block: block partial sums are independent and added up at the end
+DEFAULT_BLOCK = 1 << 18
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    # numpy < 2.0: byte lookup table
+    _BYTE_COUNTS = np.array([bin(b).count('1') for b in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return _BYTE_COUNTS[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def pack_bits(mask):
+    # (agents, A) bool -> (A, words) uint64, agents along the bits
+    packed = np.packbits(np.ascontiguousarray(mask.T), axis=1)
+    pad = -packed.shape[1] % 8
+    if pad:
+        packed = np.pad(packed, ((0, 0), (0, pad)))
+    return packed.view(np.uint64)
+
+
+def pack_ballots(L):
+    # -> (in, undec, out) bitsets of an (agents, A) label matrix
+    L = np.asarray(L, dtype=np.int8)
+    return pack_bits(L == vec.IN), pack_bits(L == vec.UNDEC), pack_bits(L == vec.OUT)
+
+
+def and_counts(X, Y):
+    # C[i, j] = popcount(X[i] & Y[j]), one row at a time: O(A * words) scratch
+    C = np.empty((X.shape[0], Y.shape[0]), dtype=np.int64)
+    for i in range(X.shape[0]):
+        C[i] = _popcount(X[i] & Y).sum(axis=1, dtype=np.int64)
+    return C
+
+
+def wins_from_bits(bits):
+    in_b, _, out_b = bits
+    return and_counts(in_b, out_b)
+
+
+def pairwise_from_bits(bits):
+    in_b, undec_b, out_b = bits
+    in_c = _popcount(in_b).sum(axis=1, dtype=np.int64)
+    return in_c[:, None] - and_counts(in_b, in_b) + and_counts(undec_b, out_b)
+
+
+def block_counts(L):
+    # (wins, pairwise) of one block of ballots
+    bits = pack_ballots(L)
+    return wins_from_bits(bits), pairwise_from_bits(bits)
+
+
+def pairwise_counts(L, block_size=DEFAULT_BLOCK, workers=1):
+    # (wins, pairwise) of an (agents, A) label matrix, equal to vectorized.in_out_wins and
+    # vectorized.pairwise_matrix. Agents are split into blocks of `block_size`; with
+    # workers > 1 the blocks run on a thread pool (numpy releases the GIL in the bit ops).
+    L = np.asarray(L, dtype=np.int8)
+    n = L.shape[1]
+    wins = np.zeros((n, n), dtype=np.int64)
+    pairwise = np.zeros((n, n), dtype=np.int64)
+    blocks = [L[start:start + block_size] for start in range(0, L.shape[0], block_size)]
+    if workers > 1 and len(blocks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(block_counts, blocks))
+    else:
+        partials = map(block_counts, blocks)
+    for w, p in partials:
+        wins += w
+        pairwise += p
+    return wins, pairwise
@@ -0,0 +1,53 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Short function words carry no topical signal for pairing arguments
+STOPWORDS = frozenset("""
+a an and are as at be been but by can could do for from has have if in into is it its may might
+more no not of on or our should so than that the their them then there these they this to was
+we were which while will with would
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS and len(t) > 2]
+
+
+def tfidf_matrix(texts: List[str]) -> np.ndarray:
+    # L2-normalised TF-IDF rows, one per text
+    docs = [Counter(tokenize(t)) for t in texts]
+    vocab = {term: j for j, term in enumerate(sorted({term for doc in docs for term in doc}))}
+    X = np.zeros((len(texts), len(vocab)))
+    for i, doc in enumerate(docs):
+        for term, count in doc.items():
+            X[i, vocab[term]] = count
+    df = np.count_nonzero(X, axis=0)
+    X *= np.log((1 + len(texts)) / (1 + df)) + 1
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    return X / np.where(norms == 0, 1, norms)
+
+
+def candidate_targets(arguments: List[Dict], top_k: int, always: Iterable[str] = ('N',)) -> Dict[str, List[str]]:
+    # For every argument, the `top_k` most lexically similar other arguments (cosine over
+    # TF-IDF) plus the `always` ids (the root claim by default). Pairs left out are not sent
+    # to the model and count as 'none'.
+    ids = [arg['id'] for arg in arguments]
+    X = tfidf_matrix([arg['text'] for arg in arguments])
+    top_k = min(top_k, len(ids) - 1)
+    always = [aid for aid in always if aid in set(ids)]
+    candidates = {}
+    # Similarities are computed in row blocks so memory stays O(block * A)
+    for start in range(0, len(ids), 1024):
+        sim = X[start:start + 1024] @ X.T
+        rows = np.arange(sim.shape[0])
+        sim[rows, rows + start] = -np.inf
+        for r in rows:
+            aid = ids[start + r]
+            # Stable sort keeps ties in dataset order
+            ranked = [ids[j] for j in np.argsort(-sim[r], kind='stable')[:max(top_k, 0)]]
+            candidates[aid] = ranked + [a for a in always if a != aid and a not in ranked]
+    return candidates
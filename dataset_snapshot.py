@@ -0,0 +1,116 @@
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from ballot_profile import Profile
+from sparse_graph import RELATION_SIGNS, SignedAdjacency, adjacency_from_arguments
+import vectorized as vec
+
+# A snapshot is a directory of raw .npy arrays plus meta.json. The arrays are opened with
+# np.load(mmap_mode='r'), so every process that loads the snapshot shares the OS page cache
+# instead of parsing and holding its own copy. The JSON dataset stays the source of truth:
+# meta.json records the size and mtime of the file the snapshot was made from.
+SNAPSHOT_VERSION = 1
+ARRAYS = ('labels', 'indptr', 'indices', 'signs')
+RELATION_NAMES = {sign: rel for rel, sign in RELATION_SIGNS.items()}
+
+Snapshot = namedtuple('Snapshot', ['meta', 'profile', 'graph'])
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def export_snapshot(dataset_path, snapshot_dir):
+    # dataset_with_relations.json -> snapshot_dir/{labels,indptr,indices,signs}.npy + meta.json
+    with open(dataset_path, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    arguments = dataset['arguments']
+    arg_ids = [arg['id'] for arg in arguments]
+    graph = adjacency_from_arguments(arguments, arg_ids)
+    index_dtype = np.int32 if max(len(arg_ids), graph.n_edges) < np.iinfo(np.int32).max else np.int64
+    arrays = {
+        'labels': vec.encode_labels(dataset['agents'], arg_ids),
+        # One index dtype for both: scipy copies mixed index arrays into a common dtype, which
+        # would give each loading process its own copy instead of the shared mapping
+        'indptr': graph.signed.indptr.astype(index_dtype),
+        'indices': graph.signed.indices.astype(index_dtype),
+        'signs': graph.signed.data.astype(np.int8),
+    }
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'source': os.path.abspath(dataset_path),
+        'source_signature': _signature(dataset_path),
+        'goal': dataset.get('goal'),
+        'agent_ids': [agent['id'] for agent in dataset['agents']],
+        # Everything but the relationships, which live in the CSR arrays
+        'arguments': [{k: v for k, v in arg.items() if k != 'relationships'} for arg in arguments],
+    }
+    os.makedirs(snapshot_dir, exist_ok=True)
+    # meta.json is written last: a snapshot without a matching meta.json is never loaded
+    meta_path = os.path.join(snapshot_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for name, array in arrays.items():
+        tmp = os.path.join(snapshot_dir, name + '.tmp.npy')
+        np.save(tmp, array)
+        os.replace(tmp, os.path.join(snapshot_dir, name + '.npy'))
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(meta_path + '.tmp', meta_path)
+    return meta
+
+
+def load_snapshot(snapshot_dir):
+    # Memory-mapped, read-only: the profile copies its labels on first write
+    with open(os.path.join(snapshot_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {meta.get('version')} in {snapshot_dir}")
+    arrays = {name: np.load(os.path.join(snapshot_dir, name + '.npy'), mmap_mode='r') for name in ARRAYS}
+    arg_ids = [arg['id'] for arg in meta['arguments']]
+    profile = Profile.shared(meta['agent_ids'], arg_ids, arrays['labels'])
+    graph = SignedAdjacency.from_csr(arg_ids, arrays['indptr'], arrays['indices'], arrays['signs'])
+    return Snapshot(meta, profile, graph)
+
+
+def is_current(snapshot_dir, dataset_path):
+    try:
+        with open(os.path.join(snapshot_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get('version') == SNAPSHOT_VERSION and meta.get('source_signature') == _signature(dataset_path)
+
+
+def load_or_export(dataset_path, snapshot_dir):
+    # Re-export when the JSON changed since the snapshot was made
+    if not is_current(snapshot_dir, dataset_path):
+        export_snapshot(dataset_path, snapshot_dir)
+    return load_snapshot(snapshot_dir)
+
+
+def snapshot_arguments(snapshot):
+    # The dataset's argument list, with 'relationships' rebuilt from the CSR arrays
+    arguments = [dict(arg, relationships={}) for arg in snapshot.meta['arguments']]
+    signed = snapshot.graph.signed
+    for target in range(signed.shape[0]):
+        for k in range(signed.indptr[target], signed.indptr[target + 1]):
+            source = signed.indices[k]
+            arguments[source]['relationships'][arguments[target]['id']] = RELATION_NAMES[int(signed.data[k])]
+    return arguments
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export a dataset JSON file as a memory-mappable snapshot.")
+    parser.add_argument('dataset', nargs='?', default='dataset_with_relations.json')
+    parser.add_argument('--out', default='dataset_snapshot')
+    opts = parser.parse_args()
+
+    meta = export_snapshot(opts.dataset, opts.out)
+    print(f"Saved {len(meta['agent_ids'])} agents x {len(meta['arguments'])} arguments to {opts.out}/")
@@ -0,0 +1,107 @@
+from collections import Counter
+
+import networkx as nx
+import numpy as np
+import plotly.graph_objects as go
+
+# Line style per relation: solid for attack, dotted for defend
+RELATION_DASH = {'attack': 'solid', 'defend': 'dot'}
+# Above this many nodes + edges the figure is drawn with WebGL (Scattergl) traces
+WEBGL_THRESHOLD = 1000
+# Per-edge hover markers are only drawn up to this many edges
+EDGE_HOVER_LIMIT = 2000
+# Largest graph laid out with the force-directed spring layout
+SPRING_LAYOUT_LIMIT = 500
+
+
+def argument_digraph(arguments):
+    G = nx.DiGraph()
+    for arg in arguments:
+        G.add_node(arg['id'], label=arg['id'] + ": " + arg['text'][:20] + "...")
+    for src_arg in arguments:
+        for target, rel in src_arg.get('relationships', {}).items():
+            G.add_edge(src_arg['id'], target, dash=RELATION_DASH.get(rel, 'dot'), relation=rel)
+    return G
+
+
+def group_digraph(arguments):
+    # One node per `group`; an edge per (source group, target group, relation) carrying the
+    # number of argument-level edges it stands for. Edges inside a group are dropped.
+    group_of = {arg['id']: arg.get('group', '') or '(none)' for arg in arguments}
+    sizes = Counter(group_of.values())
+    weights = Counter()
+    for arg in arguments:
+        for target, rel in arg.get('relationships', {}).items():
+            src, dst = group_of[arg['id']], group_of.get(target)
+            if dst is not None and src != dst:
+                weights[src, dst, rel] += 1
+    G = nx.MultiDiGraph()
+    for group, size in sizes.items():
+        G.add_node(group, label=f"{group} ({size})")
+    for (src, dst, rel), count in weights.items():
+        G.add_edge(src, dst, key=rel, dash=RELATION_DASH.get(rel, 'dot'), relation=rel, count=count)
+    return G
+
+
+def graph_layout(G, seed=42):
+    # Node -> (x, y); the expensive step, meant to be computed once and cached by the caller.
+    # Spring layout costs seconds per iteration at a few thousand nodes, so large graphs get
+    # the (sparse eigensolver) spectral layout instead.
+    if G.number_of_nodes() > SPRING_LAYOUT_LIMIT:
+        return nx.spectral_layout(G)
+    return nx.spring_layout(G, seed=seed)
+
+
+def _segments(starts, ends):
+    # x0, x1, None, x0, x1, None, ... as one list, so all segments fit in a single trace
+    coords = np.empty((len(starts), 3), dtype=object)
+    coords[:, 0] = starts
+    coords[:, 1] = ends
+    coords[:, 2] = None
+    return coords.ravel().tolist()
+
+
+def graph_figure(G, pos, title='Interactive Argumentation Graph', webgl=None):
+    # One line trace per relation type (instead of one trace per edge), one trace of hover
+    # markers at the edge midpoints and one node trace. webgl=None picks Scattergl for
+    # graphs larger than WEBGL_THRESHOLD.
+    if webgl is None:
+        webgl = G.number_of_nodes() + G.number_of_edges() > WEBGL_THRESHOLD
+    scatter = go.Scattergl if webgl else go.Scatter
+
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    xy = np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+
+    by_relation = {}
+    for src, dst, data in G.edges(data=True):
+        by_relation.setdefault(data['relation'], []).append((index[src], index[dst], data))
+
+    traces = []
+    hover_x, hover_y, hover_text = [], [], []
+    for rel, edges in by_relation.items():
+        src = np.fromiter((e[0] for e in edges), dtype=np.intp, count=len(edges))
+        dst = np.fromiter((e[1] for e in edges), dtype=np.intp, count=len(edges))
+        traces.append(scatter(x=_segments(xy[src, 0], xy[dst, 0]), y=_segments(xy[src, 1], xy[dst, 1]),
+                              line=dict(width=2, color='black', dash=RELATION_DASH.get(rel, 'dot')),
+                              hoverinfo='skip', mode='lines', name=rel))
+        if G.number_of_edges() <= EDGE_HOVER_LIMIT:
+            mid = (xy[src] + xy[dst]) / 2
+            hover_x.extend(mid[:, 0].tolist())
+            hover_y.extend(mid[:, 1].tolist())
+            for s, d, data in edges:
+                count = f" ({data['count']})" if 'count' in data else ''
+                hover_text.append(f"{nodes[s]} {rel} {nodes[d]}{count}")
+    if hover_text:
+        traces.append(scatter(x=hover_x, y=hover_y, text=hover_text, mode='markers', hoverinfo='text',
+                              marker=dict(size=6, color='rgba(0,0,0,0)')))
+
+    large = len(nodes) > WEBGL_THRESHOLD
+    traces.append(scatter(x=xy[:, 0].tolist(), y=xy[:, 1].tolist(),
+                          text=[G.nodes[node]['label'] for node in nodes],
+                          mode='markers' if large else 'markers+text',
+                          marker=dict(size=8 if large else 25, color='#1f77b4',
+                                      line=dict(width=1 if large else 2, color='DarkSlateGrey')),
+                          hoverinfo='text'))
+
+    return go.Figure(data=traces, layout=go.Layout(showlegend=False, hovermode='closest', title=title))
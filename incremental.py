@@ -0,0 +1,178 @@
+import hashlib
+from collections import defaultdict
+
+import numpy as np
+
+import bitpacked as bp
+import vectorized as vec
+from registry import FAST_METHODS, Evaluation
+from sparse_graph import adjacency_from_index
+from aggregation import meta_aggregate
+
+
+class AggregationState:
+    # Running aggregation over a changing set of agents, with the same results as
+    # aggregators.compute_aggregations. Each agent's ballot contributes a rank-one term to the
+    # counts and pairwise matrices, so adding/removing an agent is O(A^2), relabelling a
+    # single argument is O(A) and relabelling many agents at once (replace_labels) is one
+    # block update of the changed ballots. results() runs the registry.py 'fast' method set on these
+    # statistics; a method's labelling is rebuilt only when its intermediates changed since
+    # the last call.
+
+    def __init__(self, arg_ids, attackers_of=None, defenders_of=None, agents=(), adjacency=None):
+        self.arg_ids = list(arg_ids)
+        self.index = {aid: j for j, aid in enumerate(self.arg_ids)}
+        if adjacency is None:
+            adjacency = adjacency_from_index(self.arg_ids, attackers_of or {}, defenders_of or {})
+        self.graph = adjacency
+        n = len(self.arg_ids)
+        self.in_c = np.zeros(n, dtype=np.int64)
+        self.out_c = np.zeros(n, dtype=np.int64)
+        self.wins = np.zeros((n, n), dtype=np.int64)      # agents labelling i 'in' and j 'out'
+        self.pairwise = np.zeros((n, n), dtype=np.int64)  # agents ranking i above j
+        self.rows = {}  # agent id -> encoded int8 ballot
+        self._memo = {}  # method -> (intermediates, labelling) of the last results()
+        # Change tracking: every effective change ticks `clock`; agents and cells remember the
+        # tick of their last change, so "what changed since tick t" needs no label copies
+        self.clock = 0
+        self.versions = {}  # agent id -> tick of the agent's last change
+        self.added = {}     # agent id -> tick at which the agent was added
+        self.cell_versions = {}  # agent id -> {argument index: tick of its last relabel}
+        agents = list(agents)
+        if agents:
+            # One block update for the initial profile rather than one rank-one term per agent
+            self._add([agent['id'] for agent in agents], vec.encode_labels(agents, self.arg_ids))
+
+    @property
+    def n_agents(self):
+        return len(self.rows)
+
+    @property
+    def undec_c(self):
+        return self.n_agents - self.in_c - self.out_c
+
+    def profile_key(self):
+        # Digest of the sufficient statistics (counts and both pairwise matrices): equal keys
+        # mean equal results(), whatever the agents' order or ids
+        h = hashlib.sha1(np.int64(self.n_agents).tobytes())
+        for a in (self.in_c, self.out_c, self.wins, self.pairwise):
+            h.update(a.tobytes())
+        return h.hexdigest()
+
+    # --- Updates ---
+
+    def add_agent(self, agent):
+        self._add([agent['id']], vec.encode_labels([agent], self.arg_ids))
+
+    def _add(self, agent_ids, L):
+        # New agents with their (agents, A) ballots, all in one tick
+        if len(set(agent_ids)) < len(agent_ids) or any(agent_id in self.rows for agent_id in agent_ids):
+            seen = set(self.rows)
+            for agent_id in agent_ids:
+                if agent_id in seen:
+                    raise ValueError(f"Agent '{agent_id}' is already part of the aggregation")
+                seen.add(agent_id)
+        if len(agent_ids) == 1:
+            self._apply(L[0], 1)
+        else:
+            self._apply_block(L, 1)
+        self.clock += 1
+        for agent_id, row in zip(agent_ids, L):
+            self.rows[agent_id] = row
+            self.versions[agent_id] = self.added[agent_id] = self.clock
+            self.cell_versions[agent_id] = {}
+
+    def remove_agent(self, agent_id):
+        self._apply(self.rows.pop(agent_id), -1)
+        self.clock += 1
+        for table in (self.versions, self.added, self.cell_versions):
+            del table[agent_id]
+
+    def update_label(self, agent_id, aid, label):
+        row = self.rows[agent_id]
+        j = self.index[aid]
+        code = vec.LABEL_CODES.get(label, vec.UNDEC)
+        if row[j] == code:
+            return
+        self._apply_cell(row, j, -1)
+        row[j] = code
+        self._apply_cell(row, j, 1)
+        self.clock += 1
+        self.versions[agent_id] = self.cell_versions[agent_id][j] = self.clock
+
+    def replace_labels(self, agent_ids, codes):
+        # New (agents, A) int8 code matrix for the given agents, all in one tick: the changed
+        # ballots leave and re-enter the statistics as two blocks instead of cell by cell
+        codes = np.asarray(codes, dtype=np.int8)
+        if codes.shape != (len(agent_ids), len(self.arg_ids)):
+            raise ValueError(f"Expected labels of shape {(len(agent_ids), len(self.arg_ids))}, got {codes.shape}")
+        if not len(agent_ids):
+            return
+        old = np.stack([self.rows[agent_id] for agent_id in agent_ids])
+        diff = codes != old
+        changed = np.flatnonzero(diff.any(axis=1))
+        if not changed.size:
+            return
+        self._apply_block(old[changed], -1)
+        self._apply_block(codes[changed], 1)
+        self.clock += 1
+        for i in changed.tolist():
+            agent_id = agent_ids[i]
+            self.rows[agent_id][:] = codes[i]
+            self.versions[agent_id] = self.clock
+            cells = self.cell_versions[agent_id]
+            for j in np.flatnonzero(diff[i]).tolist():
+                cells[j] = self.clock
+
+    def changed_since(self, agent_id, tick):
+        # Argument ids of the agent relabelled after `tick` (all of them if added after it)
+        if self.added[agent_id] > tick:
+            return set(self.arg_ids)
+        if self.versions[agent_id] <= tick:
+            return set()
+        return {self.arg_ids[j] for j, t in self.cell_versions[agent_id].items() if t > tick}
+
+    def _apply(self, row, sign):
+        is_in = (row == vec.IN).astype(np.int64)
+        is_out = (row == vec.OUT).astype(np.int64)
+        self.in_c += sign * is_in
+        self.out_c += sign * is_out
+        self.wins += sign * np.outer(is_in, is_out)
+        self.pairwise += sign * (row[:, None] > row[None, :])
+
+    def _apply_block(self, L, sign):
+        in_c, out_c, _ = vec.vote_counts(L)
+        wins, pairwise = bp.pairwise_counts(L)
+        self.in_c += sign * in_c
+        self.out_c += sign * out_c
+        self.wins += sign * wins
+        self.pairwise += sign * pairwise
+
+    def _apply_cell(self, row, j, sign):
+        # Contribution of cell j alone: row j and column j of both matrices
+        is_in = (row == vec.IN).astype(np.int64)
+        is_out = (row == vec.OUT).astype(np.int64)
+        self.in_c[j] += sign * is_in[j]
+        self.out_c[j] += sign * is_out[j]
+        self.wins[j, :] += sign * is_in[j] * is_out
+        self.wins[:, j] += sign * is_in * is_out[j]
+        self.pairwise[j, :] += sign * (row[j] > row)
+        self.pairwise[:, j] += sign * (row > row[j])
+
+    # --- Results ---
+
+    def results(self):
+        # Same 10-tuple as aggregators.compute_aggregations
+        arg_ids = self.arg_ids
+        ev = Evaluation.from_statistics(FAST_METHODS, arg_ids, self.n_agents, self.in_c, self.out_c,
+                                        self.wins, self.pairwise, self.graph)
+        results = FAST_METHODS.evaluate(ev, memo=self._memo)
+
+        final_decision, in_f, out_f, undec_f, mild_status, behavior = meta_aggregate(results)
+
+        # in/out counters end up holding every argument in aggregators.py, undec only non-zero ones
+        in_counts = defaultdict(int, vec.to_count_dict(arg_ids, self.in_c))
+        out_counts = defaultdict(int, vec.to_count_dict(arg_ids, self.out_c))
+        undec_counts = defaultdict(int, vec.to_sparse_count_dict(arg_ids, self.undec_c))
+        return (results, final_decision, in_f, out_f, undec_f, in_counts, out_counts, undec_counts,
+                mild_status, behavior)
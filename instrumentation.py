@@ -0,0 +1,60 @@
+import time
+import tracemalloc
+
+
+def no_lap(name):
+    # Stand-in for StageTimer.lap when instrumentation is off
+    pass
+
+
+class StageTimer:
+    # Lap timer for compute_aggregations(timer=...): each lap(name) charges the wall time since
+    # the previous lap (and, with memory=True, the peak traced allocation in between) to stage
+    # `name`. One timer can be passed to many calls; stages accumulate time and call counts.
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.stages = {}  # name -> [calls, seconds, peak bytes]
+        self.runs = 0
+        self._started_tracing = False
+        self._last = None
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.runs += 1
+        self._mark()
+        return self.lap
+
+    def _mark(self):
+        if self.memory:
+            self._base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        stage = self.stages.setdefault(name, [0, 0.0, 0])
+        stage[0] += 1
+        stage[1] += now - self._last
+        if self.memory:
+            stage[2] = max(stage[2], tracemalloc.get_traced_memory()[1] - self._base)
+        self._mark()
+
+    def finish(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def report(self):
+        # Stages in the order first reached, with their share of the total time
+        total = sum(s[1] for s in self.stages.values())
+        return {
+            'runs': self.runs,
+            'total_seconds': total,
+            'stages': [{'stage': name, 'calls': calls, 'seconds': seconds,
+                        'share': seconds / total if total else 0.0,
+                        'peak_bytes': peak if self.memory else None}
+                       for name, (calls, seconds, peak) in self.stages.items()],
+        }
@@ -0,0 +1,285 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+# order: argument indices from first to last place
+# distance: number of pairwise disagreements with the profile (the Kemeny score)
+# optimal: True when the order is proven to minimise the distance
+KemenyResult = namedtuple('KemenyResult', ['order', 'distance', 'optimal'])
+
+# Components up to this size are solved by the subset DP (memory is n * 2**n ints)
+EXACT_DP_LIMIT = 16
+# Largest argument count solved by the DP vectorised across scenarios
+BATCH_DP_LIMIT = 12
+# Upper bound on memoised prefix sets kept by branch and bound
+MEMO_LIMIT = 2_000_000
+# Seconds of branch and bound before falling back to the local-search order
+DEFAULT_TIME_LIMIT = 5.0
+
+
+def kemeny_distance(P, order):
+    # Every pair placed as (earlier, later) costs the agents that prefer later over earlier
+    order = np.asarray(order, dtype=np.intp)
+    if len(order) < 2:
+        return 0
+    sub = P[np.ix_(order, order)]
+    return int(np.tril(sub, -1).sum())
+
+
+def majority_components(P):
+    # Strongly connected components of the weak majority graph (a -> b iff P[a][b] >= P[b][a]),
+    # returned in the order they must appear: every argument of an earlier component beats
+    # every argument of a later one by a strict majority, so each Kemeny ranking respects it.
+    n = P.shape[0]
+    reach = (P >= P.T)
+    np.fill_diagonal(reach, True)
+    for k in range(n):
+        reach |= reach[:, k:k + 1] & reach[k:k + 1, :]
+    mutual = reach & reach.T
+    seen = np.zeros(n, dtype=bool)
+    components = []
+    for a in range(n):
+        if not seen[a]:
+            members = np.flatnonzero(mutual[a])
+            seen[members] = True
+            components.append(members)
+    # The condensation is a transitive tournament: more reachable arguments = earlier
+    components.sort(key=lambda c: (-int(reach[c[0]].sum()), int(c[0])))
+    return components
+
+
+def _solve_dp(P):
+    # Held-Karp style DP over subsets. f[R] is the best cost of ordering the set R when it
+    # occupies the last |R| places; placing x first in R costs sum_{y in R-x} P[y][x].
+    n = P.shape[0]
+    full = 1 << n
+    # g[x, S] = sum of P[y][x] over y in S, built by doubling on the highest bit
+    g = np.zeros((n, full), dtype=np.int64)
+    popcount = np.zeros(full, dtype=np.int8)
+    for b in range(n):
+        blk = 1 << b
+        g[:, blk:2 * blk] = g[:, :blk] + P[b, :, None]
+        popcount[blk:2 * blk] = popcount[:blk] + 1
+    f = np.full(full, np.iinfo(np.int64).max, dtype=np.int64)
+    f[0] = 0
+    subsets = np.arange(full)
+    for k in range(n):
+        layer = subsets[popcount == k]
+        base = f[layer]
+        for x in range(n):
+            bit = 1 << x
+            free = (layer & bit) == 0
+            src = layer[free]
+            dst = src | bit
+            cand = base[free] + g[x, src]
+            better = cand < f[dst]
+            f[dst[better]] = cand[better]
+    # Walk back from the full set, taking the lowest index that achieves the optimum so
+    # ties resolve to the lexicographically first optimal order
+    order = []
+    R = full - 1
+    while R:
+        for x in range(n):
+            bit = 1 << x
+            if R & bit and f[R] == g[x, R ^ bit] + f[R ^ bit]:
+                order.append(x)
+                R ^= bit
+                break
+    return order, int(f[full - 1])
+
+
+def _local_search(P, order):
+    # Insertion moves: move one argument to its best position until nothing improves
+    order = list(order)
+    n = len(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n):
+            x = order[i]
+            rest = order[:i] + order[i + 1:]
+            # delta[j] = cost change of inserting x at position j of rest, relative to position 0
+            before = np.array([P[x, y] - P[y, x] for y in rest], dtype=np.int64)
+            deltas = np.concatenate(([0], np.cumsum(before)))
+            j = int(np.argmin(deltas))
+            if deltas[j] < deltas[i]:
+                order = rest[:j] + [x] + rest[j:]
+                improved = True
+    return order
+
+
+def _solve_branch_and_bound(P, seed_order, deadline):
+    n = P.shape[0]
+    best_order = _local_search(P, seed_order)
+    best = kemeny_distance(P, best_order)
+    pair_min = np.minimum(P, P.T)
+    np.fill_diagonal(pair_min, 0)
+    # Cheapest prefix cost seen for each placed set (bitmask); the cost of the rest only
+    # depends on the set, so a dearer prefix over the same set can never do better
+    memo = {}
+    nodes = 0
+    timed_out = False
+
+    # col_rem[x]: cost of placing x next (agents preferring a remaining argument over x);
+    # min_rem[x]: x's share of the lower bound on the remaining pairs
+    def search(prefix, placed, remaining, col_rem, min_rem, cost, rest_bound):
+        nonlocal best, best_order, nodes, timed_out
+        if not remaining.any():
+            if cost < best:
+                best, best_order = cost, list(prefix)
+            return
+        nodes += 1
+        if deadline is not None and nodes % 1024 == 0 and time.perf_counter() > deadline:
+            timed_out = True
+            return
+        candidates = np.flatnonzero(remaining)
+        if prefix:
+            # Adjacent-swap dominance: the next argument must not strictly beat the last one
+            last = prefix[-1]
+            candidates = candidates[P[candidates, last] <= P[last, candidates]]
+        added = col_rem[candidates]
+        relieved = min_rem[candidates]
+        for i in np.argsort(added - relieved, kind='stable'):
+            x = int(candidates[i])
+            new_cost = cost + int(added[i])
+            new_bound = rest_bound - int(relieved[i])
+            if new_cost + new_bound >= best:
+                continue
+            mask = placed | (1 << x)
+            if memo.get(mask, best) <= new_cost:
+                continue
+            if len(memo) < MEMO_LIMIT:
+                memo[mask] = new_cost
+            prefix.append(x)
+            remaining[x] = False
+            search(prefix, mask, remaining, col_rem - P[x], min_rem - pair_min[x], new_cost, new_bound)
+            remaining[x] = True
+            prefix.pop()
+            if timed_out:
+                return
+
+    root_bound = int(np.triu(pair_min, 1).sum())
+    if best > root_bound:
+        search([], 0, np.ones(n, dtype=bool), P.sum(axis=0), pair_min.sum(axis=0), 0, root_bound)
+    return best_order, best, not timed_out
+
+
+def kemeny_ranking(P, seed_scores=None, exact_limit=EXACT_DP_LIMIT, time_limit=DEFAULT_TIME_LIMIT, deadline=None):
+    # P[a][b] = number of agents preferring a over b (the pairwise matrix, as a square array).
+    # The problem is split into majority components; components up to `exact_limit` arguments
+    # use the subset DP, larger ones use branch and bound seeded by `seed_scores` (Copeland
+    # by default) and fall back to the local-search order when `time_limit` seconds run out.
+    # deadline: a time.perf_counter() value shared with other calls, instead of time_limit.
+    P = np.asarray(P, dtype=np.int64)
+    n = P.shape[0]
+    if n == 0:
+        return KemenyResult([], 0, True)
+    if seed_scores is None:
+        seed_scores = np.sign(P - P.T).sum(axis=1)
+    if deadline is None and time_limit is not None:
+        deadline = time.perf_counter() + time_limit
+    order = []
+    optimal = True
+    for comp in majority_components(P):
+        comp = sorted(comp.tolist())
+        if len(comp) == 1:
+            order.extend(comp)
+            continue
+        sub = P[np.ix_(comp, comp)]
+        if len(comp) <= exact_limit:
+            local, _ = _solve_dp(sub)
+        else:
+            seed = sorted(range(len(comp)), key=lambda i: (-seed_scores[comp[i]], i))
+            local, _, proven = _solve_branch_and_bound(sub, seed, deadline)
+            optimal = optimal and proven
+        order.extend(comp[i] for i in local)
+    return KemenyResult(order, kemeny_distance(P, order), optimal)
+
+
+def kemeny_orders_batch(P, max_bytes=64 * 2 ** 20, time_limit=DEFAULT_TIME_LIMIT, deadline=None):
+    # P: (scenarios, n, n) pairwise matrices. Runs the subset DP for all scenarios at once
+    # (same lexicographic tie-breaking as _solve_dp) when n <= BATCH_DP_LIMIT, otherwise
+    # kemeny_ranking per scenario, all of them within one `time_limit` (or `deadline`).
+    # Returns (orders (scenarios, n), distances (scenarios,), optimal (scenarios,) bool).
+    P = np.asarray(P, dtype=np.int64)
+    S, n = P.shape[0], P.shape[-1]
+    if n > BATCH_DP_LIMIT:
+        if deadline is None and time_limit is not None:
+            deadline = time.perf_counter() + time_limit
+        rankings = [kemeny_ranking(P[s], deadline=deadline) for s in range(S)]
+        return (np.array([r.order for r in rankings], dtype=np.intp).reshape(S, n),
+                np.array([r.distance for r in rankings], dtype=np.int64),
+                np.array([r.optimal for r in rankings], dtype=bool).reshape(S))
+    full = 1 << n
+    step = max(1, max_bytes // (8 * (n + 1) * full))
+    orders = np.empty((S, n), dtype=np.intp)
+    distances = np.empty(S, dtype=np.int64)
+    popcount = np.zeros(full, dtype=np.int8)
+    for b in range(n):
+        popcount[1 << b:2 << b] = popcount[:1 << b] + 1
+    subsets = np.arange(full)
+    layers = [subsets[popcount == k] for k in range(n)]
+    for start in range(0, S, step):
+        Pc = P[start:start + step]
+        m = Pc.shape[0]
+        g = np.zeros((m, n, full), dtype=np.int64)
+        for b in range(n):
+            blk = 1 << b
+            g[:, :, blk:2 * blk] = g[:, :, :blk] + Pc[:, b, :, None]
+        f = np.full((m, full), np.iinfo(np.int64).max, dtype=np.int64)
+        f[:, 0] = 0
+        for layer in layers:
+            for x in range(n):
+                bit = 1 << x
+                src = layer[(layer & bit) == 0]
+                dst = src | bit
+                f[:, dst] = np.minimum(f[:, dst], f[:, src] + g[:, x, src])
+        rows = np.arange(m)
+        R = np.full(m, full - 1)
+        for pos in range(n):
+            chosen = np.full(m, -1)
+            for x in range(n):
+                bit = 1 << x
+                ok = (chosen < 0) & ((R & bit) != 0)
+                ok &= f[rows, R] == g[rows, x, R ^ bit] + f[rows, R ^ bit]
+                chosen[ok] = x
+            orders[start:start + m, pos] = chosen
+            R = R ^ (1 << chosen)
+        distances[start:start + m] = f[:, full - 1]
+    return orders, distances, np.ones(S, dtype=bool)
+
+
+def kemeny_winners_batch(P, time_limit=DEFAULT_TIME_LIMIT, deadline=None):
+    # First-ranked argument of the Kemeny ranking per scenario (-1 when there are no
+    # arguments), and whether it is proven (False: the ranking ran out of time). The winner
+    # always lies in the top majority component (the Smith set), whose ranking does not
+    # depend on the other arguments, so the DP only runs on it, batched over the scenarios
+    # that share its size. All scenarios share one `time_limit` (or `deadline`).
+    P = np.asarray(P, dtype=np.int64)
+    S, n = P.shape[0], P.shape[-1]
+    winners = np.full(S, -1, dtype=np.intp)
+    optimal = np.ones(S, dtype=bool)
+    if n == 0:
+        return winners, optimal
+    if deadline is None and time_limit is not None:
+        deadline = time.perf_counter() + time_limit
+    reach = P >= np.swapaxes(P, -1, -2)
+    reach |= np.eye(n, dtype=bool)
+    for k in range(n):
+        reach |= reach[:, :, k:k + 1] & reach[:, k:k + 1, :]
+    top = reach.all(axis=-1)
+    sizes = top.sum(axis=-1)
+    # Members of the top component first, in index order, so tie-breaking is unchanged
+    members = np.argsort(~top, axis=-1, kind='stable')
+    for m in np.unique(sizes):
+        group = np.flatnonzero(sizes == m)
+        idx = members[group, :m]
+        if m == 1:
+            winners[group] = idx[:, 0]
+            continue
+        sub = np.take_along_axis(np.take_along_axis(P[group], idx[:, :, None], axis=1), idx[:, None, :], axis=2)
+        orders, _, proven = kemeny_orders_batch(sub, deadline=deadline)
+        winners[group] = idx[np.arange(len(group)), orders[:, 0]]
+        optimal[group] = proven
+    return winners, optimal
@@ -0,0 +1,301 @@
+import warnings
+
+import numpy as np
+
+import bitpacked as bp
+import vectorized as vec
+from kemeny import kemeny_ranking
+
+# Label code for arguments a method leaves unlabelled (aggregators.py Copeland with all
+# contests tied); they are missing from the method's labelling
+NO_LABEL = 2
+
+
+class MethodRegistry:
+    # Named aggregation rules with declared dependencies on shared intermediates.
+    # Intermediates are computed lazily, once per Evaluation; aliases are plain references.
+    # Rules return int8 label codes and broadcast over a leading scenario axis, so batch.py
+    # runs the same method sets on stacked profiles.
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.intermediates = {}  # name -> (needs, fn)
+        self.methods = {}        # name -> (needs, fn), or the target name for an alias
+
+    def intermediate(self, name, fn, needs=()):
+        self.intermediates[name] = (tuple(needs), fn)
+
+    def method(self, name, fn, needs=()):
+        self.methods[name] = (tuple(needs), fn)
+
+    def alias(self, name, target):
+        self.methods[name] = target
+
+    def names(self):
+        return list(self.methods)
+
+    def resolve(self, name):
+        target = self.methods[name]
+        while isinstance(target, str):
+            name, target = target, self.methods[target]
+        return name
+
+    def lookup_intermediate(self, name):
+        if name in self.intermediates:
+            return self.intermediates[name]
+        if self.parent is not None:
+            return self.parent.lookup_intermediate(name)
+        raise KeyError(f"Unknown intermediate '{name}'")
+
+    def requirements(self, names=None):
+        # Every intermediate needed (transitively) by the given methods
+        needed = set()
+        stack = [dep for name in (names or self.names()) for dep in self.methods[self.resolve(name)][0]]
+        while stack:
+            dep = stack.pop()
+            if dep not in needed:
+                needed.add(dep)
+                stack.extend(self.lookup_intermediate(dep)[0])
+        return needed
+
+    def codes(self, ev, names=None):
+        # Label codes for the requested methods (all of them by default), in registry order
+        names = self.names() if names is None else list(names)
+        computed = {}
+        results = {}
+        for name in names:
+            target = self.resolve(name)
+            if target not in computed:
+                needs, fn = self.methods[target]
+                for dep in needs:
+                    ev.get(dep)
+                computed[target] = fn(ev)
+            results[name] = computed[target]
+        return results
+
+    def evaluate(self, ev, names=None, memo=None):
+        # Labellings for the requested methods, as codes() does. memo: {method: (inputs,
+        # labelling)} kept by the caller between evaluations; a method whose intermediates
+        # are unchanged since the last one reuses its labelling instead of rebuilding it.
+        names = self.names() if names is None else list(names)
+        computed = {}
+        results = {}
+        for name in names:
+            target = self.resolve(name)
+            if target not in computed:
+                needs, fn = self.methods[target]
+                inputs = [ev.get(dep) for dep in needs]
+                cached = memo.get(target) if memo is not None else None
+                if cached is not None and _same(cached[0], inputs):
+                    computed[target] = cached[1]
+                else:
+                    computed[target] = ev.labelling(fn(ev))
+                    if memo is not None:
+                        memo[target] = (_snapshot(inputs), computed[target])
+            results[name] = computed[target]
+        return results
+
+
+def _same(a, b):
+    if isinstance(a, (tuple, list)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return np.array_equal(a, b)
+
+
+def _snapshot(value):
+    # Copy of an intermediate whose arrays may be updated in place later
+    if isinstance(value, (tuple, list)):
+        return [_snapshot(v) for v in value]
+    return value.copy() if isinstance(value, np.ndarray) else value
+
+
+class Evaluation:
+    # Inputs of one aggregation (label matrix + graph) and the intermediates computed so far
+
+    def __init__(self, registry, arg_ids, labels, graph):
+        self.registry = registry
+        self.arg_ids = list(arg_ids)
+        self.labels = labels
+        self.graph = graph
+        self.n_agents = labels.shape[-2]
+        self.cache = {}
+
+    @classmethod
+    def from_agents(cls, registry, agents, arg_ids, graph):
+        return cls(registry, arg_ids, vec.encode_labels(agents, arg_ids), graph)
+
+    @classmethod
+    def from_statistics(cls, registry, arg_ids, n_agents, in_c, out_c, wins, pairwise, graph):
+        # No ballots, only the sufficient statistics: every method reads nothing else
+        ev = cls(registry, arg_ids, np.empty((n_agents, 0), dtype=np.int8), graph)
+        ev.cache.update(counts=(in_c, out_c, n_agents - in_c - out_c), wins=wins, pairwise=pairwise)
+        return ev
+
+    def get(self, name):
+        if name not in self.cache:
+            needs, fn = self.registry.lookup_intermediate(name)
+            for dep in needs:
+                self.get(dep)
+            self.cache[name] = fn(self)
+        return self.cache[name]
+
+    def labelling(self, codes):
+        # Label codes of one profile -> {argument id: label}, without NO_LABEL arguments
+        return {aid: vec.CODE_LABELS[c] for aid, c in zip(self.arg_ids, codes.tolist()) if c != NO_LABEL}
+
+
+# --- Shared intermediates ---
+
+# From this many agents on, the win and pairwise matrices of a single profile are counted on
+# bit-packed ballots (bitpacked.py) instead of BLAS products of float indicator matrices
+BITPACK_MIN_AGENTS = 1000
+
+
+def _bit_packed(ev):
+    return ev.labels.ndim == 2 and ev.n_agents >= BITPACK_MIN_AGENTS
+
+
+def _wins(ev):
+    return bp.wins_from_bits(ev.get('bitsets')) if _bit_packed(ev) else vec.in_out_wins(ev.labels)
+
+
+def _pairwise(ev):
+    return bp.pairwise_from_bits(ev.get('bitsets')) if _bit_packed(ev) else vec.pairwise_matrix(ev.labels)
+
+
+INTERMEDIATES = MethodRegistry()
+INTERMEDIATES.intermediate('counts', lambda ev: vec.vote_counts(ev.labels))
+INTERMEDIATES.intermediate('pro_con', lambda ev: ev.graph.pro_con(*ev.get('counts')[:2]), needs=('counts',))
+INTERMEDIATES.intermediate('net_support', lambda ev: ev.graph.net_support(*ev.get('counts')[:2]), needs=('counts',))
+# Shared by 'wins' and 'pairwise' when _bit_packed
+INTERMEDIATES.intermediate('bitsets', lambda ev: bp.pack_ballots(ev.labels))
+INTERMEDIATES.intermediate('wins', _wins)
+INTERMEDIATES.intermediate('pairwise', _pairwise)
+INTERMEDIATES.intermediate('borda', lambda ev: vec.borda_scores(*ev.get('counts')[:2]), needs=('counts',))
+INTERMEDIATES.intermediate('borda_di', lambda ev: ev.graph.apply_di(ev.get('borda')), needs=('borda',))
+INTERMEDIATES.intermediate('veto', lambda ev: vec.veto_scores(ev.get('counts')[1]), needs=('counts',))
+INTERMEDIATES.intermediate('veto_di', lambda ev: ev.graph.apply_di(ev.get('veto')), needs=('veto',))
+# aggregators.py scores Copeland/Simpson on the in/out win matrix ...
+INTERMEDIATES.intermediate('copeland_wins', lambda ev: vec.copeland_scores(ev.get('wins')), needs=('wins',))
+INTERMEDIATES.intermediate('copeland_wins_di', lambda ev: ev.graph.apply_di(ev.get('copeland_wins')),
+                           needs=('copeland_wins',))
+INTERMEDIATES.intermediate('simpson_wins', lambda ev: vec.simpson_scores(ev.get('wins')), needs=('wins',))
+# ... aggregators2.py on the in > undec > out pairwise matrix
+INTERMEDIATES.intermediate('copeland', lambda ev: vec.copeland_scores(ev.get('pairwise')), needs=('pairwise',))
+INTERMEDIATES.intermediate('copeland_di', lambda ev: ev.graph.apply_di(ev.get('copeland')), needs=('copeland',))
+INTERMEDIATES.intermediate('simpson', lambda ev: vec.simpson_scores(ev.get('pairwise')), needs=('pairwise',))
+INTERMEDIATES.intermediate('simpson_di', lambda ev: ev.graph.apply_di(ev.get('simpson')), needs=('simpson',))
+INTERMEDIATES.intermediate('apref', lambda ev: vec.apref_scores(ev.get('pairwise')), needs=('pairwise',))
+INTERMEDIATES.intermediate('kemeny', lambda ev: kemeny_ranking(ev.get('pairwise'), ev.get('copeland')),
+                           needs=('pairwise', 'copeland'))
+
+
+def _kemeny_first(ev):
+    kemeny = ev.get('kemeny')
+    if not kemeny.optimal:
+        warnings.warn("Kemeny-Young search hit its time limit: AKEMEN_D uses the best ranking found, "
+                      "which is not proven optimal", RuntimeWarning)
+    return kemeny.order[0] if kemeny.order else -1
+
+
+# Index of the Kemeny winner, -1 without arguments
+INTERMEDIATES.intermediate('kemeny_winner', _kemeny_first, needs=('kemeny',))
+
+
+# --- Rules shared by both method sets ---
+
+def _winners(mask):
+    return np.where(mask, vec.IN, vec.OUT).astype(np.int8)
+
+
+def _majority(ev):
+    in_c, out_c, _ = ev.get('counts')
+    half = ev.n_agents / 2
+    return np.where(in_c > half, vec.IN, np.where(out_c > half, vec.OUT, vec.UNDEC)).astype(np.int8)
+
+
+def _veto(ev):
+    return _winners(ev.get('counts')[1] == 0)
+
+
+def _best_simpson(scores):
+    def rule(ev):
+        s = ev.get(scores)
+        if s.shape[-1] == 0:
+            return s.astype(np.int8)
+        return _winners(s == s.max(axis=-1, keepdims=True))
+    return rule
+
+
+def _signed(scores):
+    return lambda ev: vec.label_vector(ev.get(scores))
+
+
+def _copeland_decided(ev):
+    # Arguments whose contests are all tied get no label, as in aggregators.py
+    decided = vec.copeland_decided(ev.get('wins'))
+    return np.where(decided, vec.label_vector(ev.get('copeland_wins')), NO_LABEL).astype(np.int8)
+
+
+def _kemeny_winner(ev):
+    winner = np.asarray(ev.get('kemeny_winner'))
+    return _winners(np.arange(len(ev.arg_ids)) == winner[..., None])
+
+
+# --- aggregators.py method set ("fast": Kemeny and APREF approximated by Copeland) ---
+
+FAST_METHODS = MethodRegistry(INTERMEDIATES)
+FAST_METHODS.method('Opinion-First (OF)', _signed('borda'), needs=('borda',))
+FAST_METHODS.method('Support-First (SF)', _signed('net_support'), needs=('net_support',))
+FAST_METHODS.alias('Balanced (BF)', 'Support-First (SF)')
+FAST_METHODS.alias('ABORDA_S', 'Opinion-First (OF)')
+FAST_METHODS.method('ABORDA_SDI', _signed('borda_di'), needs=('borda_di',))
+FAST_METHODS.alias('ABORDA_P', 'ABORDA_S')
+FAST_METHODS.alias('ABORDA_PDI', 'ABORDA_SDI')
+FAST_METHODS.method('ACOP_D', _copeland_decided, needs=('wins', 'copeland_wins'))
+FAST_METHODS.method('ACOP_DI(Att/Def)', _signed('copeland_wins_di'), needs=('copeland_wins_di',))
+FAST_METHODS.alias('ACOP_DI(Pro/Con)', 'Balanced (BF)')
+FAST_METHODS.method('ARGVET_D', _veto, needs=('counts',))
+FAST_METHODS.method('ARGVET_DI', _signed('veto_di'), needs=('veto_di',))
+FAST_METHODS.alias('ACUMUL', 'ABORDA_S')
+FAST_METHODS.alias('AKEMEN_D', 'ACOP_D')
+FAST_METHODS.alias('AKEMEN_DI', 'ACOP_DI(Att/Def)')
+FAST_METHODS.method('ASIMP_D', _best_simpson('simpson_wins'), needs=('simpson_wins',))
+FAST_METHODS.alias('ASIMP_DI', 'Balanced (BF)')
+for _name in ['APREF_MLD', 'APREF_MD', 'APREF_MLD(T)', 'APREF_MD(T)', 'APREF_DIMLD', 'APREF_DIMD']:
+    FAST_METHODS.alias(_name, 'ACOP_D' if 'DI' not in _name else 'ACOP_DI(Att/Def)')
+
+# --- aggregators2.py method set ("exact": pairwise matrix, Kemeny-Young, Simpson DI) ---
+
+EXACT_METHODS = MethodRegistry(INTERMEDIATES)
+EXACT_METHODS.method('Majority (M)', _majority, needs=('counts',))
+EXACT_METHODS.method('Opinion-First (OF)', _signed('borda'), needs=('borda',))
+EXACT_METHODS.method('Support-First (SF)', _signed('net_support'), needs=('net_support',))
+EXACT_METHODS.alias('Balanced (BF)', 'Support-First (SF)')
+EXACT_METHODS.alias('ABORDA_S', 'Opinion-First (OF)')
+EXACT_METHODS.method('ABORDA_SDI', _signed('borda_di'), needs=('borda_di',))
+EXACT_METHODS.alias('ABORDA_P', 'ABORDA_S')
+EXACT_METHODS.alias('ABORDA_PDI', 'ABORDA_SDI')
+EXACT_METHODS.method('ACOP_D', _signed('copeland'), needs=('copeland',))
+EXACT_METHODS.method('ACOP_DI(Att/Def)', _signed('copeland_di'), needs=('copeland_di',))
+EXACT_METHODS.alias('ACOP_DI(Pro/Con)', 'Balanced (BF)')
+EXACT_METHODS.method('AKEMEN_D', _kemeny_winner, needs=('kemeny_winner',))
+EXACT_METHODS.alias('AKEMEN_DI', 'ACOP_DI(Att/Def)')
+EXACT_METHODS.method('ASIMP_D', _best_simpson('simpson'), needs=('simpson',))
+EXACT_METHODS.method('ASIMP_DI', _signed('simpson_di'), needs=('simpson_di',))
+EXACT_METHODS.method('APREF_MLD', _signed('apref'), needs=('apref',))
+EXACT_METHODS.alias('APREF_MD', 'APREF_MLD')
+EXACT_METHODS.method('ARGVET_D', _veto, needs=('counts',))
+EXACT_METHODS.method('ARGVET_DI', _signed('veto_di'), needs=('veto_di',))
+EXACT_METHODS.alias('ACUMUL', 'ABORDA_SDI')
+
+METHOD_SETS = {'fast': FAST_METHODS, 'exact': EXACT_METHODS}
+# Method set of every entry point (aggregate, aggregate_batch, simulate, ...) unless given
+DEFAULT_MODE = 'fast'
+
+
+def evaluate_methods(agents, arg_ids, graph, mode=DEFAULT_MODE, methods=None):
+    # Labellings for a subset of methods; only the intermediates they need are computed
+    registry = METHOD_SETS[mode]
+    ev = Evaluation.from_agents(registry, agents, arg_ids, graph)
+    return registry.evaluate(ev, methods)
@@ -0,0 +1,59 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable
+
+
+def pair_key(model: str, template: str, source_text: str, target_text: str) -> str:
+    # Content address of one classification: any change to the model, the prompt template
+    # or either argument's text gives a new key
+    payload = json.dumps([model, template, source_text, target_text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RelationCache:
+    # Persistent (SQLite) store of pairwise relation classifications, safe to share between threads
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS relations ("
+                          "key TEXT PRIMARY KEY, relation TEXT NOT NULL, created REAL NOT NULL)")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(keys)
+        found = {}
+        with self.lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, relation FROM relations WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                found.update(rows)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, relations: Dict[str, str]) -> None:
+        now = time.time()
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO relations (key, relation, created) VALUES (?, ?, ?)",
+                                  [(k, v, now) for k, v in relations.items()])
+            self.conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        with self.lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM relations").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0, 'entries': size}
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,145 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from aggregation import DEFAULT_MODE, MODES, aggregate_agents
+from sparse_graph import adjacency_from_arguments
+
+
+def debate_paths(inputs):
+    # Directories (their *.json files), manifests (*.txt: one path per line, relative to the
+    # manifest) and debate files, in the given order without duplicates
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths += sorted(glob.glob(os.path.join(item, '*.json')))
+        elif item.endswith('.txt'):
+            base = os.path.dirname(item)
+            with open(item, 'r', encoding='utf-8') as f:
+                paths += [os.path.join(base, line.strip()) for line in f
+                          if line.strip() and not line.startswith('#')]
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(paths))
+
+
+def run_debate(path, mode=DEFAULT_MODE, root='N'):
+    # One debate -> one output record; errors are reported in the record, never raised
+    record = {'debate': path, 'mode': mode}
+    start = time.perf_counter()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            dataset = json.load(f)
+        arguments = dataset['arguments']
+        arg_ids = [arg['id'] for arg in arguments]
+        # Built once and shared by every method of this debate
+        graph = adjacency_from_arguments(arguments, arg_ids)
+        loaded = time.perf_counter()
+        result = aggregate_agents(dataset['agents'], arg_ids, graph, mode, root=root)
+        done = time.perf_counter()
+    except Exception as e:
+        record.update(ok=False, error=f"{e.__class__.__name__}: {e}", traceback=traceback.format_exc(),
+                      seconds={'total': time.perf_counter() - start})
+        return record
+    record.update(
+        ok=True,
+        n_arguments=len(arg_ids),
+        n_agents=len(dataset['agents']),
+        n_edges=graph.n_edges,
+        final_decision=result.final_decision,
+        in_f=result.in_f, out_f=result.out_f, undec_f=result.undec_f,
+        labels=result.labels,
+        mild_status=result.mild_status,
+        kemeny_optimal=result.kemeny_optimal,
+        seconds={'load': loaded - start, 'aggregate': done - loaded, 'total': done - start},
+    )
+    return record
+
+
+def _crashed(path, mode, error):
+    return {'debate': path, 'mode': mode, 'ok': False, 'error': error, 'traceback': None, 'seconds': None}
+
+
+def run_all(paths, mode=DEFAULT_MODE, workers=None, root='N'):
+    # Yields one record per debate as soon as it finishes. A worker process that dies takes
+    # the shared pool down with it; the debates still pending then run again one process
+    # each, so only the debate that actually crashes is reported as crashed.
+    pending = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_debate, path, mode, root): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                pending.append(futures[future])
+    for path in pending:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            try:
+                yield pool.submit(run_debate, path, mode, root).result()
+            except BrokenProcessPool:
+                yield _crashed(path, mode, "worker process died")
+
+
+class JsonlSink:
+    # One record per line, flushed as it arrives
+
+    def __init__(self, path):
+        self.file = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ParquetSink:
+    # Parquet is columnar, so records are collected and written once at the end; nested
+    # fields are stored as JSON strings. Needs pandas with pyarrow (or fastparquet).
+
+    def __init__(self, path):
+        import pandas  # noqa: F401  (fail before any debate runs if it is missing)
+        self.path = path
+        self.records = []
+
+    def write(self, record):
+        self.records.append({k: json.dumps(v, ensure_ascii=False) if isinstance(v, dict) else v
+                             for k, v in record.items()})
+
+    def close(self):
+        import pandas as pd
+        pd.DataFrame(self.records).to_parquet(self.path, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate many debate files in parallel.")
+    parser.add_argument('inputs', nargs='+', help="debate JSON files, directories of them, or .txt manifests")
+    parser.add_argument('--mode', choices=MODES, default=DEFAULT_MODE)
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument('--root', default='N', help="argument the final decision is about")
+    parser.add_argument('--output', default='-', help="output file, '-' for stdout")
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default=None,
+                        help="default: parquet for *.parquet outputs, jsonl otherwise")
+    opts = parser.parse_args()
+
+    fmt = opts.format or ('parquet' if opts.output.endswith('.parquet') else 'jsonl')
+    sink = ParquetSink(opts.output) if fmt == 'parquet' else JsonlSink(opts.output)
+    paths = debate_paths(opts.inputs)
+    start = time.perf_counter()
+    failed = 0
+    try:
+        for record in run_all(paths, opts.mode, opts.workers, opts.root):
+            failed += not record['ok']
+            sink.write(record)
+    finally:
+        sink.close()
+    print(f"{len(paths)} debates, {failed} failed, {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,330 @@
+import time
+import warnings
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+import vectorized as vec
+
+# Dung semantics over the attack relation only ('defend' edges play no part). Labellings are
+# int8 vectors aligned with arg_ids in vectorized.py's encoding (in=1, undec=0, out=-1), and
+# the checks accept a leading axis, e.g. one row per aggregation method.
+#
+# An argument is legally
+#   in    - when all its attackers are out,
+#   out   - when some attacker is in,
+#   undec - when no attacker is in and not all of them are out.
+# A labelling is admissible when every in and out argument is legal, and complete when every
+# argument is (Caminada's labelling formulation).
+
+# Upper bound on the labellings enumerated by complete_labellings / preferred_labellings, and
+# seconds the search may take before it stops with a warning (None: no limit)
+DEFAULT_LIMIT = 10_000
+DEFAULT_TIME_LIMIT = 5.0
+
+
+class AttackGraph:
+    # matrix[t, s] = 1 iff s attacks t (CSR, like SignedAdjacency); targets is its transpose
+    __slots__ = ('arg_ids', 'index', 'matrix', 'targets')
+
+    def __init__(self, arg_ids, matrix):
+        self.arg_ids = list(arg_ids)
+        self.index = {aid: i for i, aid in enumerate(self.arg_ids)}
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.int32)
+        self.matrix.sum_duplicates()
+        self.matrix.data[:] = 1
+        self.targets = self.matrix.T.tocsr()
+
+    @classmethod
+    def from_adjacency(cls, graph):
+        # The attack edges of a sparse_graph.SignedAdjacency
+        attacks = -graph.signed.minimum(0)
+        attacks.eliminate_zeros()
+        return cls(graph.arg_ids, attacks)
+
+    @classmethod
+    def from_index(cls, arg_ids, attackers_of):
+        index = {aid: i for i, aid in enumerate(arg_ids)}
+        rows, cols = [], []
+        for aid in arg_ids:
+            for b in attackers_of.get(aid, ()):
+                if b in index:
+                    rows.append(index[aid])
+                    cols.append(index[b])
+        n = len(index)
+        return cls(arg_ids, sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n, n)))
+
+    def encode(self, labelling):
+        # {argument id: label} -> code vector; missing arguments are undec
+        return np.fromiter((vec.LABEL_CODES.get(labelling.get(aid), vec.UNDEC) for aid in self.arg_ids),
+                           dtype=np.int8, count=len(self.arg_ids))
+
+
+# --- Legality checks ---
+
+def legality(ag, codes):
+    # -> (legally in, legally out, legally undec) boolean masks, shaped like codes
+    codes = np.asarray(codes, dtype=np.int8)
+    in_attackers = (ag.matrix @ (codes == vec.IN).T.astype(np.int32)).T
+    live_attackers = (ag.matrix @ (codes != vec.OUT).T.astype(np.int32)).T
+    return live_attackers == 0, in_attackers > 0, (in_attackers == 0) & (live_attackers > 0)
+
+
+def illegal(ag, codes, semantics='complete'):
+    # Mask of the arguments whose label breaks `semantics` ('admissible' or 'complete')
+    codes = np.asarray(codes, dtype=np.int8)
+    legal_in, legal_out, legal_undec = legality(ag, codes)
+    bad = ((codes == vec.IN) & ~legal_in) | ((codes == vec.OUT) & ~legal_out)
+    if semantics == 'complete':
+        bad |= (codes == vec.UNDEC) & ~legal_undec
+    elif semantics != 'admissible':
+        raise ValueError(f"Unknown semantics '{semantics}'")
+    return bad
+
+
+def is_admissible(ag, codes):
+    return ~illegal(ag, codes, 'admissible').any(axis=-1)
+
+
+def is_complete(ag, codes):
+    return ~illegal(ag, codes, 'complete').any(axis=-1)
+
+
+def check_labellings(ag, labellings):
+    # {method: {argument id: label}} -> {method: {'admissible', 'complete', 'grounded'}}, with
+    # all methods checked in one sparse product
+    names = list(labellings)
+    if not names:
+        return {}
+    codes = np.stack([ag.encode(labellings[name]) for name in names])
+    legal_in, legal_out, legal_undec = legality(ag, codes)
+    admissible = ~(((codes == vec.IN) & ~legal_in) | ((codes == vec.OUT) & ~legal_out)).any(axis=1)
+    complete = admissible & ~((codes == vec.UNDEC) & ~legal_undec).any(axis=1)
+    grounded = (codes == grounded_labelling(ag)).all(axis=1)
+    return {name: {'admissible': bool(a), 'complete': bool(c), 'grounded': bool(g)}
+            for name, a, c, g in zip(names, admissible.tolist(), complete.tolist(), grounded.tolist())}
+
+
+# --- Grounded semantics ---
+
+def grounded_labelling(ag):
+    # Least complete labelling, O(arguments + attacks): an argument enters the worklist when
+    # its last attacker goes out; every target of an in argument goes out.
+    n = len(ag.arg_ids)
+    indptr = ag.targets.indptr.tolist()
+    targets = ag.targets.indices.tolist()
+    live = np.diff(ag.matrix.indptr).tolist()  # attackers not yet out
+    codes = [vec.UNDEC] * n
+    labelled = [False] * n
+    worklist = [a for a in range(n) if live[a] == 0]
+    for a in worklist:
+        # Nothing attacking `a` can be in (all its attackers are out), so it is still unlabelled
+        labelled[a] = True
+        codes[a] = vec.IN
+        for t in targets[indptr[a]:indptr[a + 1]]:
+            if not labelled[t]:
+                labelled[t] = True
+                codes[t] = vec.OUT
+                for u in targets[indptr[t]:indptr[t + 1]]:
+                    live[u] -= 1
+                    if live[u] == 0 and not labelled[u]:
+                        worklist.append(u)
+    return np.array(codes, dtype=np.int8)
+
+
+# --- Complete and preferred semantics ---
+
+def _ordered_components(ag, nodes):
+    # Strongly connected components of the attack graph restricted to `nodes`, attackers'
+    # components first
+    sub = ag.matrix[nodes][:, nodes]
+    n_comp, comp = csgraph.connected_components(sub, directed=True, connection='strong')
+    sub = sub.tocoo()
+    across = comp[sub.row] != comp[sub.col]
+    # Condensation edges: component of the attacker (col) -> component of the target (row)
+    edges = set(zip(comp[sub.col[across]].tolist(), comp[sub.row[across]].tolist()))
+    indegree = [0] * n_comp
+    out_edges = [[] for _ in range(n_comp)]
+    for s, t in edges:
+        out_edges[s].append(t)
+        indegree[t] += 1
+    order = [c for c in range(n_comp) if indegree[c] == 0]
+    for c in order:
+        for t in out_edges[c]:
+            indegree[t] -= 1
+            if indegree[t] == 0:
+                order.append(t)
+    members = [[] for _ in range(n_comp)]
+    for node, c in zip(nodes.tolist(), comp.tolist()):
+        members[c].append(node)
+    return [members[c] for c in order]
+
+
+def _component_labellings(ag, component, codes, deadline, cap=None):
+    # Complete labellings of one component given the final labels of its outside attackers,
+    # as (in set, {argument: code}), at most `cap` of them, or None when `deadline` passes
+    # first. Arguments are decided in or not-in one at a time: an in argument puts its
+    # targets out and takes its attackers out of the running, and a partial labelling is
+    # dropped as soon as an in argument has an attacker that can no longer go out, or a
+    # not-in argument that is not out has all its attackers out (or must go out and no
+    # longer can).
+    local = {a: i for i, a in enumerate(component)}
+    m = len(component)
+    attackers = [[] for _ in range(m)]
+    targets = [[] for _ in range(m)]
+    forced_out = [False] * m
+    live = [False] * m  # some outside attacker is undec: never in, never all attackers out
+    for i, a in enumerate(component):
+        for b in ag.matrix.indices[ag.matrix.indptr[a]:ag.matrix.indptr[a + 1]].tolist():
+            if b in local:
+                attackers[i].append(local[b])
+                targets[local[b]].append(i)
+            elif codes[b] == vec.IN:
+                forced_out[i] = True
+            elif codes[b] == vec.UNDEC:
+                live[i] = True
+    # None: still open; UNDEC: not in, and out only once an attacker goes in
+    state = [None] * m
+    for i in range(m):
+        if forced_out[i]:
+            state[i] = vec.OUT
+        elif live[i] or i in attackers[i]:
+            state[i] = vec.UNDEC
+    trail = []  # (argument, previous state), undone on backtracking
+
+    def assign(i, label):
+        trail.append((i, state[i]))
+        state[i] = label
+
+    def can_go_out(i):
+        return state[i] == vec.OUT or any(state[b] is None or state[b] == vec.IN for b in attackers[i])
+
+    def legal(i):
+        if state[i] == vec.IN:
+            return all(can_go_out(b) for b in attackers[i])
+        if state[i] == vec.UNDEC:
+            if not live[i] and all(state[b] == vec.OUT for b in attackers[i]):
+                return False
+            if any(state[t] == vec.IN for t in targets[i]) and not can_go_out(i):
+                return False
+        return True
+
+    def decide(i, take):
+        # Label i in (take) or not in, propagate, and check every argument whose legality
+        # may have changed
+        changed = [i]
+        near = set()
+        if take:
+            assign(i, vec.IN)
+            for t in targets[i]:
+                if state[t] != vec.OUT:
+                    assign(t, vec.OUT)
+                    changed.append(t)
+            for b in attackers[i]:
+                if state[b] is None:
+                    assign(b, vec.UNDEC)
+                    changed.append(b)
+            near.update(attackers[i])
+        else:
+            assign(i, vec.UNDEC)
+        for c in changed:
+            near.add(c)
+            for t in targets[c]:
+                near.add(t)
+                near.update(targets[t])
+        return all(legal(x) for x in near)
+
+    found = []
+    choices = []  # (argument, trail length before deciding it, in already tried)
+    nodes = 0
+    ok = all(legal(i) for i in range(m))
+    i = 0
+    while True:
+        if ok:
+            while i < m and state[i] is not None:
+                i += 1
+            if i == m:
+                labels = {component[j]: state[j] for j in range(m)}
+                found.append((frozenset(a for a, c in labels.items() if c == vec.IN), labels))
+                if cap is not None and len(found) >= cap:
+                    return found
+                ok = False
+                continue
+            nodes += 1
+            if deadline is not None and nodes % 1024 == 0 and time.perf_counter() > deadline:
+                return None
+            choices.append((i, len(trail), False))
+            ok = decide(i, True)
+            continue
+        while choices and choices[-1][2]:
+            choices.pop()
+        if not choices:
+            return found
+        i, mark, _ = choices.pop()
+        while len(trail) > mark:
+            j, previous = trail.pop()
+            state[j] = previous
+        choices.append((i, mark, True))
+        ok = decide(i, False)
+
+
+def _labellings(ag, maximal, limit, time_limit):
+    # Grounded labels are shared by every complete labelling, so only the grounded-undec
+    # arguments are searched, component by component in attack order
+    base = grounded_labelling(ag)
+    open_nodes = np.flatnonzero(base == vec.UNDEC)
+    if open_nodes.size == 0:
+        return [base]
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    components = _ordered_components(ag, open_nodes)
+    codes = base.tolist()
+    results = []
+    # Depth-first over components without recursion: options[k] holds the labellings of
+    # component k given the labels chosen for the components before it
+    options = [None] * len(components)
+    position = [0] * len(components)
+    k = 0
+    while k >= 0 and len(results) < limit:
+        if k == len(components):
+            results.append(np.array(codes, dtype=np.int8))
+            k -= 1
+            continue
+        if options[k] is None:
+            # Every complete labelling of a component extends to the later ones, so complete
+            # semantics needs no more options than labellings still wanted; preferred needs
+            # all of them to keep the maximal ones
+            cap = None if maximal else limit - len(results)
+            found = _component_labellings(ag, components[k], codes, deadline, cap)
+            if found is None:
+                warnings.warn(f"Labelling search hit its time limit ({time_limit}s): returning the "
+                              f"{len(results)} labellings found so far", RuntimeWarning)
+                break
+            if maximal:
+                # Preferred is SCC-recursive: keep the in-maximal labellings of each component
+                found = [(s, labels) for s, labels in found if not any(s < other for other, _ in found)]
+            options[k] = found
+            position[k] = 0
+        if position[k] < len(options[k]):
+            for a, c in options[k][position[k]][1].items():
+                codes[a] = c
+            position[k] += 1
+            k += 1
+        else:
+            options[k] = None
+            for a in components[k]:
+                codes[a] = vec.UNDEC
+            k -= 1
+    return results
+
+
+def complete_labellings(ag, limit=DEFAULT_LIMIT, time_limit=DEFAULT_TIME_LIMIT):
+    return _labellings(ag, False, limit, time_limit)
+
+
+def preferred_labellings(ag, limit=DEFAULT_LIMIT, time_limit=DEFAULT_TIME_LIMIT):
+    return _labellings(ag, True, limit, time_limit)
+
+
+def labelling_dict(ag, codes):
+    return vec.labels_to_dict(codes, ag.arg_ids)
@@ -0,0 +1,273 @@
+from collections import namedtuple
+
+import numpy as np
+
+import vectorized as vec
+from aggregation import meta_aggregate
+from ballot_stream import BallotStatistics
+from registry import DEFAULT_MODE, METHOD_SETS
+
+# How many agents must change their ballot before a method labels the root differently.
+#
+# label:  the method's current label of the root ('undec' when it leaves the root unlabelled)
+# margin: smallest number of ballots to replace for the label to change (None: impossible)
+# exact:  True when the margin is proven minimal, False when it is an upper bound
+# how:    'analytic' (closed form on the score intermediates) or 'search'
+FlipMargin = namedtuple('FlipMargin', ['label', 'margin', 'exact', 'how'])
+
+# Resolved method name -> score the root label is the sign of. All of them are sums over
+# agents of a per-agent term, root score = sum_a sum_j W[j] * g(ballot_a[j]), so the reach of
+# a single agent is known in closed form.
+LINEAR_SCORES = {
+    'Opinion-First (OF)': 'borda',        # W = e_root,                g = code
+    'Support-First (SF)': 'net_support',  # W = signed[root],          g = code
+    'ABORDA_SDI': 'borda_di',             # W = e_root + signed[root], g = code
+    'ARGVET_DI': 'veto_di',               # W = e_root + signed[root], g = -[code == out]
+}
+# Also closed-form: 'Majority (M)', 'ARGVET_D' (root counts only) and exact APREF (_apref_margin)
+# Additive parts of BallotStatistics
+STATISTICS = ('in_c', 'out_c', 'wins', 'pairwise')
+CODES = np.array([vec.IN, vec.UNDEC, vec.OUT], dtype=np.int8)
+
+
+def _root_label(labeling, root):
+    return labeling.get(root) or 'undec'
+
+
+# --- Closed forms ---
+
+def _score_weights(kind, graph, r):
+    row = graph.signed.getrow(r).toarray().ravel().astype(np.int64)
+    if kind == 'borda':
+        W = np.zeros_like(row)
+    elif kind == 'net_support':
+        return row, lambda codes: codes.astype(np.int64)
+    else:
+        W = row
+    W[r] += 1
+    if kind == 'veto_di':
+        return W, lambda codes: -(codes == vec.OUT).astype(np.int64)
+    return W, lambda codes: codes.astype(np.int64)
+
+
+def _reach_margin(score, up, down):
+    # Root label = sign(score), score a sum of per-agent terms; up / down: how far each agent
+    # can move its own term. The first k agents by reach that cover the gap to the other side
+    # of zero (or away from zero).
+    if score > 0:
+        need, reach = score, down
+    elif score < 0:
+        need, reach = -score, up
+    else:
+        need, reach = 1, np.maximum(up, down)
+    covered = np.cumsum(np.sort(reach)[::-1])
+    if not covered.size or covered[-1] < need:
+        return None
+    return int(np.searchsorted(covered, need)) + 1
+
+
+def _linear_margin(L, W, g):
+    cols = np.flatnonzero(W)
+    current = W[cols] * g(L[:, cols])
+    options = W[cols] * g(CODES)[:, None]  # (3, cols): every label's term
+    up = (options.max(axis=0) - current).sum(axis=1)
+    down = (current - options.min(axis=0)).sum(axis=1)
+    return _reach_margin(int(current.sum()), up, down)
+
+
+def _apref_margin(L, r):
+    # APREF score of the root = sum over agents of sign(root label - other label) over the
+    # other arguments, between -(A - 1) and A - 1 for every agent
+    terms = np.sign(L[:, [r]].astype(np.int64) - L).sum(axis=1)
+    bound = L.shape[1] - 1
+    return _reach_margin(int(terms.sum()), bound - terms, terms + bound)
+
+
+def _majority_margin(in_c, out_c, n):
+    # Each changed ballot moves the root's in or out count by at most one
+    half = n // 2
+    if in_c > n / 2:
+        return in_c - half
+    if out_c > n / 2:
+        return out_c - half
+    return min(half + 1 - in_c, half + 1 - out_c) if n else None
+
+
+def _veto_margin(out_c, n):
+    # In while nobody labels it out: one 'out' ballot flips it, every 'out' must go otherwise
+    return (1 if n else None) if out_c == 0 else out_c
+
+
+# --- Search ---
+
+def _templates(graph, r):
+    # Extreme ballots to replace others with: the root up (in, all others out) and down (out,
+    # all others in); the root with its defenders up and its attackers down, and the reverse,
+    # for the DI rules; a flat all-undec ballot that adds no pairwise preference; and for
+    # winner-type rules (Simpson, Kemeny) one per rival: that rival in, everything else out
+    n = len(graph.arg_ids)
+    relation = graph.signed.getrow(r).toarray().ravel()
+    up = np.full(n, vec.OUT, dtype=np.int8)
+    up[r] = vec.IN
+    down = np.full(n, vec.IN, dtype=np.int8)
+    down[r] = vec.OUT
+    support = np.sign(relation).astype(np.int8)
+    support[r] = vec.IN
+    templates = [up, down, support, -support, np.zeros(n, dtype=np.int8)]
+    for j in range(n):
+        if j != r:
+            rival = np.full(n, vec.OUT, dtype=np.int8)
+            rival[j] = vec.IN
+            templates.append(rival)
+    return templates
+
+
+class _Replacements:
+    # Profiles with the k agents furthest from `template` replaced by it, evaluated from the
+    # sufficient statistics only: base minus the removed ballots plus k copies of the template.
+    # The removed ballots' statistics are kept per probed k and extended from the nearest
+    # smaller one, so a whole doubling + bisection search folds O(agents) ballots.
+
+    def __init__(self, registry, arg_ids, L, graph, base, template):
+        self.registry = registry
+        self.arg_ids = arg_ids
+        self.graph = graph
+        self.base = base
+        self.order = L[np.argsort(-np.abs(L.astype(np.int16) - template).sum(axis=1), kind='stable')]
+        self.single = BallotStatistics(arg_ids)
+        self.single.add_labels(template[None, :])
+        self.removed = {0: BallotStatistics(arg_ids)}
+        self.evaluations = {}
+
+    def _removed(self, k):
+        start = max(j for j in self.removed if j <= k)
+        stats = self.removed[start]
+        if start < k:
+            grown = BallotStatistics(self.arg_ids)
+            grown.n_agents = stats.n_agents
+            for name in STATISTICS:
+                setattr(grown, name, getattr(stats, name).copy())
+            grown.add_labels(self.order[start:k])
+            stats = self.removed[k] = grown
+        return stats
+
+    def evaluation(self, k):
+        ev = self.evaluations.get(k)
+        if ev is None:
+            removed = self._removed(k)
+            stats = BallotStatistics(self.arg_ids)
+            stats.n_agents = self.base.n_agents
+            for name in STATISTICS:
+                setattr(stats, name, getattr(self.base, name) - getattr(removed, name) + k * getattr(self.single, name))
+            ev = self.evaluations[k] = stats.evaluation(self.registry, self.graph)
+        return ev
+
+
+def _search(replacements, flipped, n):
+    # Smallest k flipping the outcome along each replacement order: doubling, then bisection
+    # between the last k that did not flip and the first that did. Later orders only look
+    # below the best k so far. An upper bound, since other replacements (or non-monotone
+    # rules) may flip with fewer agents.
+    best = None
+    for rep in replacements:
+        limit = n if best is None else best - 1
+        low, k = 0, 1
+        while k <= limit and not flipped(rep.evaluation(k)):
+            low, k = k, 2 * k
+        if k > limit:
+            if limit == low or not flipped(rep.evaluation(limit)):
+                continue
+            k = limit
+        while k - low > 1:
+            mid = (low + k) // 2
+            if flipped(rep.evaluation(mid)):
+                k = mid
+            else:
+                low = mid
+        best = k
+    return best
+
+
+# --- Entry points ---
+
+def flip_margins(labels, arg_ids, graph, mode=DEFAULT_MODE, methods=None, root='N'):
+    # labels: (agents, A) int8 matrix; graph: SignedAdjacency. -> {method: FlipMargin}
+    registry = METHOD_SETS[mode]
+    names = registry.names() if methods is None else list(methods)
+    arg_ids = list(arg_ids)
+    r = arg_ids.index(root)
+    L = np.asarray(labels, dtype=np.int8)
+    n = L.shape[0]
+    base = BallotStatistics(arg_ids)
+    base.add_labels(L)
+    ev = base.evaluation(registry, graph)
+    replacements = [_Replacements(registry, arg_ids, L, graph, base, t) for t in _templates(graph, r)]
+    margins = {}
+    computed = {}
+    for name in names:
+        target = registry.resolve(name)
+        if target not in computed:
+            label = _root_label(registry.evaluate(ev, [target])[target], root)
+            if target in LINEAR_SCORES:
+                margin = _linear_margin(L, *_score_weights(LINEAR_SCORES[target], graph, r))
+                computed[target] = FlipMargin(label, margin, True, 'analytic')
+            elif target == 'APREF_MLD':
+                computed[target] = FlipMargin(label, _apref_margin(L, r), True, 'analytic')
+            elif target == 'Majority (M)':
+                computed[target] = FlipMargin(label, _majority_margin(int(base.in_c[r]), int(base.out_c[r]), n),
+                                              True, 'analytic')
+            elif target == 'ARGVET_D':
+                computed[target] = FlipMargin(label, _veto_margin(int(base.out_c[r]), n), True, 'analytic')
+            else:
+                def flipped(ev_k, target=target, label=label):
+                    return _root_label(registry.evaluate(ev_k, [target])[target], root) != label
+                margin = _search(replacements, flipped, n)
+                computed[target] = FlipMargin(label, margin, margin == 1, 'search')
+        margins[name] = computed[target]
+    return margins
+
+
+def decision_margin(labels, arg_ids, graph, mode=DEFAULT_MODE, methods=None, root='N'):
+    # The same for the meta-aggregated final decision over all (or the given) methods
+    registry = METHOD_SETS[mode]
+    arg_ids = list(arg_ids)
+    r = arg_ids.index(root)
+    L = np.asarray(labels, dtype=np.int8)
+    base = BallotStatistics(arg_ids)
+    base.add_labels(L)
+
+    def decision(ev):
+        return meta_aggregate(registry.evaluate(ev, methods), root)[0]
+    label = decision(base.evaluation(registry, graph))
+    replacements = [_Replacements(registry, arg_ids, L, graph, base, t) for t in _templates(graph, r)]
+    margin = _search(replacements, lambda ev: decision(ev) != label, L.shape[0])
+    return FlipMargin(label, margin, margin == 1, 'search')
+
+
+def flip_margins_agents(agents, arg_ids, graph, mode=DEFAULT_MODE, methods=None, root='N'):
+    # Same, from the dataset's [{'id': ..., 'labels': {...}}] agent list
+    return flip_margins(vec.encode_labels(agents, arg_ids), arg_ids, graph, mode, methods, root)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from sparse_graph import adjacency_from_arguments
+
+    parser = argparse.ArgumentParser(description="Flip margin of every method's label of the root argument.")
+    parser.add_argument('dataset', nargs='?', default='dataset_with_relations.json')
+    parser.add_argument('--mode', choices=list(METHOD_SETS), default=DEFAULT_MODE)
+    parser.add_argument('--root', default='N')
+    opts = parser.parse_args()
+
+    with open(opts.dataset, 'r', encoding='utf-8') as f:
+        dataset = json.load(f)
+    ids = [arg['id'] for arg in dataset['arguments']]
+    adjacency = adjacency_from_arguments(dataset['arguments'], ids)
+    L = vec.encode_labels(dataset['agents'], ids)
+    for method, m in flip_margins(L, ids, adjacency, opts.mode, root=opts.root).items():
+        bound = '=' if m.exact else '<='
+        print(f"{method:<20} {m.label:<6} margin {bound} {m.margin}  ({m.how})")
+    m = decision_margin(L, ids, adjacency, opts.mode, root=opts.root)
+    print(f"{'Final decision':<20} {m.label:<6} margin {'=' if m.exact else '<='} {m.margin}  ({m.how})")
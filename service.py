@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+import vectorized as vec
+from aggregation import DEFAULT_MODE, MODES, aggregate
+from registry import METHOD_SETS
+from sparse_graph import adjacency_from_arguments
+
+# Headless aggregation over HTTP/1.1 (keep-alive, JSON bodies), standard library + numpy only.
+#
+#   POST /aggregate  {"debate": name | "arguments": [...],
+#                     "agents": [{"id", "labels": {...}}] | "labels": [[1, 0, -1, ...], ...],
+#                     "mode": "fast" | "exact", "root": "N", "methods": [...]}
+#   POST /debates    {"name": ..., "arguments": [...]}  register a graph and keep it warm
+#   GET  /debates, GET /stats, GET /health
+#
+# Responses are cached by (graph hash, profile hash, mode, root, methods). The profile hash is
+# taken over the label matrix with its rows sorted: every method depends on the multiset of
+# ballots only, so requests that differ in agent order, agent ids or the order of labels
+# within a ballot share one entry. Identical requests arriving while the first one is still
+# being computed wait for it instead of computing again.
+DEFAULT_CACHE_SIZE = 1024
+GRAPH_CACHE_SIZE = 64
+MAX_BODY = 64 << 20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'entries': len(self.entries), 'size': self.size, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0}
+
+
+def graph_key(arguments):
+    # Canonical hash of a debate graph: argument ids in order plus their sorted relationships
+    canonical = [[arg['id'], sorted(arg.get('relationships', {}).items())] for arg in arguments]
+    return hashlib.sha1(json.dumps(canonical, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def profile_key(labels):
+    # Canonical hash of a (agents, A) label matrix: order-free over agents
+    labels = np.ascontiguousarray(labels, dtype=np.int8)
+    if labels.shape[0] > 1:
+        labels = labels[np.lexsort(labels.T[::-1])]
+    h = hashlib.sha1(str(labels.shape).encode('ascii'))
+    h.update(labels.tobytes())
+    return h.hexdigest()
+
+
+class Debate:
+    # A graph ready to aggregate over: built once, shared read-only by every request
+    __slots__ = ('key', 'arg_ids', 'graph')
+
+    def __init__(self, arguments):
+        self.key = graph_key(arguments)
+        self.arg_ids = [arg['id'] for arg in arguments]
+        self.graph = adjacency_from_arguments(arguments, self.arg_ids)
+
+
+class AggregationService:
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE, workers=None):
+        self.debates = {}  # registered name -> Debate
+        self.graphs = LRUCache(GRAPH_CACHE_SIZE)  # graph key -> Debate, for inline arguments
+        self.results = LRUCache(cache_size)  # request key -> encoded response body
+        self.inflight = {}  # request key -> Future of the response body
+        self.shared = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def register(self, name, arguments):
+        debate = Debate(arguments)
+        self.debates[name] = debate
+        self.graphs.put(debate.key, debate)
+        return debate
+
+    def _debate(self, request):
+        if 'debate' in request:
+            if not isinstance(request['debate'], str):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'debate' must be a debate name")
+            debate = self.debates.get(request['debate'])
+            if debate is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown debate '{request['debate']}'")
+            return debate
+        arguments = request.get('arguments')
+        if not isinstance(arguments, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected 'debate' or an 'arguments' list")
+        self._check_arguments(arguments)
+        key = graph_key(arguments)
+        debate = self.graphs.get(key)
+        if debate is None:
+            debate = Debate(arguments)
+            self.graphs.put(key, debate)
+        return debate
+
+    @staticmethod
+    def _check_arguments(arguments):
+        # Client debate graph: objects with unique string ids and {argument id: relation} maps
+        ids = set()
+        for i, arg in enumerate(arguments):
+            if not isinstance(arg, dict) or not isinstance(arg.get('id'), str):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"arguments[{i}] must be an object with a string 'id'")
+            if arg['id'] in ids:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Duplicate argument id '{arg['id']}'")
+            ids.add(arg['id'])
+            relationships = arg.get('relationships', {})
+            if not isinstance(relationships, dict) or not all(isinstance(r, str) for r in relationships.values()):
+                raise HTTPError(HTTPStatus.BAD_REQUEST,
+                                f"arguments[{i}] 'relationships' must map argument ids to relation names")
+
+    @staticmethod
+    def _labels(request, arg_ids):
+        # Client ballots -> (agents, A) int8 matrix; anything malformed is a 400, never coerced
+        n = len(arg_ids)
+        if 'labels' in request:
+            rows = request['labels']
+            if not isinstance(rows, list) or not all(isinstance(row, list) and len(row) == n for row in rows):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"'labels' must be an (agents, {n}) matrix")
+            if not all(type(v) is int and vec.OUT <= v <= vec.IN for row in rows for v in row):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'labels' entries must be 1 (in), 0 (undec) or -1 (out)")
+            return np.array(rows, dtype=np.int8).reshape(len(rows), n)
+        agents = request.get('agents')
+        if not isinstance(agents, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected an 'agents' list or a 'labels' matrix")
+        for i, agent in enumerate(agents):
+            if not isinstance(agent, dict) or not isinstance(agent.get('labels'), dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"agents[{i}] must have a 'labels' object")
+            if not all(label in vec.LABEL_CODES for label in agent['labels'].values()):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"agents[{i}] labels must be 'in', 'undec' or 'out'")
+        return vec.encode_labels(agents, arg_ids)
+
+    async def aggregate(self, request):
+        # -> (encoded response body, whether it came from the cache)
+        mode = request.get('mode', DEFAULT_MODE)
+        if mode not in MODES:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"'mode' must be one of {', '.join(MODES)}")
+        methods = request.get('methods')
+        if methods is not None:
+            if not isinstance(methods, list) or not all(isinstance(m, str) for m in methods):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "'methods' must be a list of method names")
+            unknown = [m for m in methods if m not in METHOD_SETS[mode].methods]
+            if unknown:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown methods for mode '{mode}': {unknown}")
+        debate = self._debate(request)
+        root = request.get('root', 'N')
+        if not isinstance(root, str) or root not in debate.arg_ids:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'root' must be one of the argument ids")
+        labels = self._labels(request, debate.arg_ids)
+        key = (debate.key, profile_key(labels), mode, root, None if methods is None else tuple(methods))
+
+        body = self.results.get(key)
+        if body is not None:
+            return body, True
+        pending = self.inflight.get(key)
+        if pending is not None:
+            self.shared += 1
+            return await asyncio.shield(pending), True
+        loop = asyncio.get_running_loop()
+        pending = loop.run_in_executor(self.executor, self._compute, debate, labels, mode, methods, root)
+        self.inflight[key] = pending
+        try:
+            body = await pending
+        finally:
+            del self.inflight[key]
+        self.results.put(key, body)
+        return body, False
+
+    @staticmethod
+    def _compute(debate, labels, mode, methods, root):
+        result = aggregate(labels, debate.arg_ids, debate.graph, mode, methods, root)
+        payload = result._asdict()
+        payload['n_agents'] = int(labels.shape[0])
+        return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    def stats(self):
+        return {'results': self.results.stats(), 'graphs': self.graphs.stats(),
+                'inflight': len(self.inflight), 'shared_inflight': self.shared,
+                'debates': len(self.debates)}
+
+    # --- HTTP ---
+
+    async def route(self, method, path, body):
+        # -> (status, encoded body, extra headers)
+        if path == '/aggregate':
+            if method != 'POST':
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+            payload, hit = await self.aggregate(_json_body(body))
+            return HTTPStatus.OK, payload, {'X-Cache': 'hit' if hit else 'miss'}
+        if path == '/debates':
+            if method == 'GET':
+                listing = {name: {'arguments': len(d.arg_ids), 'edges': d.graph.n_edges, 'graph_key': d.key}
+                           for name, d in self.debates.items()}
+                return HTTPStatus.OK, _dumps(listing), {}
+            if method == 'POST':
+                request = _json_body(body)
+                if not isinstance(request.get('name'), str) or not isinstance(request.get('arguments'), list):
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a 'name' and an 'arguments' list")
+                self._check_arguments(request['arguments'])
+                debate = self.register(request['name'], request['arguments'])
+                return HTTPStatus.CREATED, _dumps({'name': request['name'], 'graph_key': debate.key}), {}
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET or POST")
+        if path == '/stats' and method == 'GET':
+            return HTTPStatus.OK, _dumps(self.stats()), {}
+        if path == '/health' and method == 'GET':
+            return HTTPStatus.OK, b'{"status": "ok"}', {}
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+    async def handle(self, reader, writer):
+        # One connection; requests are served in order until the client closes or asks to
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                close = False
+                try:
+                    try:
+                        method, target, version = request_line.decode('latin-1').split()
+                        length = int(headers.get('content-length', 0))
+                        if length < 0:
+                            raise ValueError(length)
+                    except ValueError:
+                        close = True  # the body, if any, cannot be delimited
+                        raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line or Content-Length")
+                    if length > MAX_BODY:
+                        close = True  # the body is left unread
+                        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload, extra = await self.route(method, target.split('?', 1)[0], body)
+                except HTTPError as e:
+                    status, payload, extra = e.status, _dumps({'error': str(e)}), {}
+                    version = 'HTTP/1.1'
+                except Exception as e:
+                    status, payload, extra = (HTTPStatus.INTERNAL_SERVER_ERROR,
+                                              _dumps({'error': f"{e.__class__.__name__}: {e}"}), {})
+                    version = 'HTTP/1.1'
+                keep_alive = not close and (headers.get('connection', '').lower() != 'close' if version == 'HTTP/1.1'
+                                            else headers.get('connection', '').lower() == 'keep-alive')
+                head = [f"HTTP/1.1 {status.value} {status.phrase}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(payload)}",
+                        "Connection: " + ('keep-alive' if keep_alive else 'close')]
+                head += [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _dumps(obj):
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _json_body(body):
+    try:
+        request = json.loads(body)
+    except ValueError as e:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid JSON: {e}")
+    if not isinstance(request, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a JSON object")
+    return request
+
+
+def load_debate_file(spec):
+    # 'name=path.json' or 'path.json' (named after the file)
+    name, sep, path = spec.partition('=')
+    if not sep:
+        name, path = os.path.splitext(os.path.basename(spec))[0], spec
+    with open(path, 'r', encoding='utf-8') as f:
+        return name, json.load(f)['arguments']
+
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Serving on http://{host}:{port} ({len(service.debates)} debates registered)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve collective decisions over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--register', action='append', default=[], metavar='[NAME=]PATH',
+                        help="debate JSON file whose graph is loaded at startup; repeatable")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help="cached responses")
+    parser.add_argument('--workers', type=int, default=None, help="aggregation threads")
+    opts = parser.parse_args()
+
+    service = AggregationService(opts.cache_size, opts.workers)
+    for spec in opts.register:
+        service.register(*load_debate_file(spec))
+    try:
+        asyncio.run(serve(service, opts.host, opts.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,94 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import vectorized as vec
+from batch import DEFAULT_CHUNK, aggregate_batch
+from registry import DEFAULT_MODE, NO_LABEL
+
+# Outcome codes on the root argument, in tally order (NO_LABEL: aggregators.py ACOP_D with all
+# contests tied)
+OUTCOMES = (vec.OUT, vec.UNDEC, vec.IN, NO_LABEL)
+OUTCOME_NAMES = ('out', 'undec', 'in', 'none')
+
+SimulationSummary = namedtuple('SimulationSummary', [
+    'n_profiles',          # number of simulated profiles
+    'methods',             # method names, in evaluation order
+    'frequencies',         # method -> {'in'|'out'|'undec'|'none': share of profiles}
+    'final_frequencies',   # meta decision -> share of profiles
+    'agreement',           # method -> share of profiles where it matches the meta decision
+    'pairwise_agreement',  # (methods, methods) array: share of profiles where both agree on the root
+    'kemeny_optimal',      # share of profiles whose Kemeny ranking (AKEMEN_D) is proven optimal,
+                           # None when no method needed it
+])
+
+
+# --- Noise models: (rng, base ballots (agents, A) int8, k) -> (k, agents, A) int8 profiles ---
+
+def uniform_profiles(rng, base, k, p=None):
+    # Every label drawn uniformly from in/out/undec; the base only fixes the shape
+    return rng.integers(vec.OUT, vec.IN + 1, size=(k,) + base.shape, dtype=np.int8)
+
+
+def flip_profiles(rng, base, k, p=0.1):
+    # Each label of the base profile replaced, with probability p, by one of the other two
+    flip = rng.random((k,) + base.shape) < p
+    shift = rng.integers(1, 3, size=flip.shape, dtype=np.int8)
+    flipped = (base + 1 + shift) % 3 - 1
+    return np.where(flip, flipped, base).astype(np.int8)
+
+
+NOISE_MODELS = {'uniform': uniform_profiles, 'flip': flip_profiles}
+
+
+def _tally(task):
+    # Draw and aggregate one chunk; returns the count arrays summed by simulate()
+    seed, k, base, arg_ids, graph, noise, p, mode, methods, root = task
+    rng = np.random.default_rng(seed)
+    profiles = NOISE_MODELS[noise](rng, base, k, p)
+    out, final, _, _, _, mild, kemeny_optimal = aggregate_batch(profiles, arg_ids, graph, mode, methods, root,
+                                                                chunk_size=k)
+    n_index = list(arg_ids).index(root)
+    root_codes = np.stack([codes[:, n_index] for codes in out.values()])  # (methods, k)
+    onehot = (root_codes[:, :, None] == np.array(OUTCOMES, dtype=np.int8)).astype(np.int64)
+    counts = onehot.sum(axis=1)
+    final_counts = (final[:, None] == np.array(OUTCOMES[:3], dtype=np.int8)).sum(axis=0)
+    agree = np.array([m.sum() for m in mild.values()])
+    pairwise = np.einsum('mko,nko->mn', onehot, onehot)
+    proven = None if kemeny_optimal is None else int(kemeny_optimal.sum())
+    return list(out), counts, final_counts, agree, pairwise, proven
+
+
+def simulate(base_labels, arg_ids, graph, k, noise='flip', p=0.1, seed=None, mode=DEFAULT_MODE, methods=None,
+             root='N', chunk_size=DEFAULT_CHUNK, processes=1):
+    # Monte Carlo distribution of every method's label on `root` over k random profiles.
+    # base_labels: (agents, A) int8 ballots in vectorized.py's encoding (the profile the noise
+    # model perturbs). Each chunk draws from its own child of SeedSequence(seed), so a seeded
+    # run gives the same summary for any number of processes.
+    if k < 1:
+        raise ValueError(f"k must be at least 1 profile, got {k}")
+    base = np.asarray(base_labels, dtype=np.int8)
+    sizes = [min(chunk_size, k - start) for start in range(0, k, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(s, n, base, list(arg_ids), graph, noise, p, mode, methods, root) for s, n in zip(seeds, sizes)]
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            parts = list(pool.map(_tally, tasks))
+    else:
+        parts = [_tally(task) for task in tasks]
+
+    names = parts[0][0]
+    counts, final_counts, agree, pairwise = (sum(part[i] for part in parts) for i in range(1, 5))
+    total = k
+    proven = [part[5] for part in parts]
+    frequencies = {name: dict(zip(OUTCOME_NAMES, (row / total).tolist())) for name, row in zip(names, counts)}
+    return SimulationSummary(
+        n_profiles=k,
+        methods=names,
+        frequencies=frequencies,
+        final_frequencies=dict(zip(OUTCOME_NAMES[:3], (final_counts / total).tolist())),
+        agreement={name: a / total for name, a in zip(names, np.asarray(agree).tolist())},
+        pairwise_agreement=np.asarray(pairwise) / total,
+        kemeny_optimal=None if None in proven else sum(proven) / total,
+    )
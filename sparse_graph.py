@@ -0,0 +1,97 @@
+import numpy as np
+from scipy import sparse
+
+# Edge weights of the signed adjacency matrix (row = target, column = source)
+RELATION_SIGNS = {'defend': 1, 'attack': -1}
+
+
+class SignedAdjacency:
+    # Relationship graph built once as CSR and reused across aggregation calls.
+    # signed[t, s] is +1 if s defends t and -1 if s attacks t; unsigned = |signed|.
+    __slots__ = ('arg_ids', 'index', 'signed', 'unsigned')
+
+    def __init__(self, arg_ids, rows, cols, signs):
+        self.arg_ids = list(arg_ids)
+        self.index = {aid: i for i, aid in enumerate(self.arg_ids)}
+        n = len(self.arg_ids)
+        data = np.asarray(signs, dtype=np.int8)
+        self.signed = sparse.csr_matrix((data, (rows, cols)), shape=(n, n))
+        self.signed.sum_duplicates()
+        self.unsigned = abs(self.signed)
+
+    @classmethod
+    def from_csr(cls, arg_ids, indptr, indices, signs):
+        # Wrap existing CSR arrays of the signed matrix (e.g. memory-mapped ones) without copying them
+        self = cls.__new__(cls)
+        self.arg_ids = list(arg_ids)
+        self.index = {aid: i for i, aid in enumerate(self.arg_ids)}
+        n = len(self.arg_ids)
+        self.signed = sparse.csr_matrix((signs, indices, indptr), shape=(n, n), copy=False)
+        # Only the data differs: the index arrays stay shared with `signed`
+        self.unsigned = sparse.csr_matrix((np.abs(self.signed.data), self.signed.indices, self.signed.indptr),
+                                          shape=(n, n), copy=False)
+        return self
+
+    @property
+    def n_edges(self):
+        return self.signed.nnz
+
+    # Score vectors may carry a leading scenario axis, shape (scenarios, A); the mat-vec
+    # then becomes one sparse mat-mat over all scenarios.
+
+    def pro_con(self, in_c, out_c):
+        # pro = defenders' in + attackers' out, con = defenders' out + attackers' in.
+        # net (pro - con) and total (pro + con) are one mat-vec each.
+        in_c = np.asarray(in_c, dtype=np.int64)
+        out_c = np.asarray(out_c, dtype=np.int64)
+        net = (self.signed @ (in_c - out_c).T).T
+        total = (self.unsigned @ (in_c + out_c).T).T
+        return (total + net) // 2, (total - net) // 2
+
+    def net_support(self, in_c, out_c):
+        # pro - con only, for the SF/BF labels
+        return (self.signed @ (np.asarray(in_c, dtype=np.int64) - np.asarray(out_c, dtype=np.int64)).T).T
+
+    def apply_di(self, base):
+        # DI score: own score + defenders' scores - attackers' scores
+        base = np.asarray(base, dtype=np.int64)
+        return base + (self.signed @ base.T).T
+
+    def vector(self, scores):
+        # Dict of scores keyed by argument id -> dense vector (missing ids score 0)
+        return np.fromiter((scores.get(aid, 0) for aid in self.arg_ids), dtype=np.int64, count=len(self.arg_ids))
+
+
+def adjacency_from_arguments(arguments, arg_ids=None):
+    # Build from the 'relationships' field of dataset_with_relations.json
+    if arg_ids is None:
+        arg_ids = [arg['id'] for arg in arguments]
+    index = {aid: i for i, aid in enumerate(arg_ids)}
+    rows, cols, signs = [], [], []
+    for arg in arguments:
+        src = index.get(arg['id'])
+        if src is None:
+            continue
+        for target, rel in arg.get('relationships', {}).items():
+            t = index.get(target)
+            if t is not None and rel in RELATION_SIGNS:
+                rows.append(t)
+                cols.append(src)
+                signs.append(RELATION_SIGNS[rel])
+    return SignedAdjacency(arg_ids, rows, cols, signs)
+
+
+def adjacency_from_index(arg_ids, attackers_of, defenders_of):
+    # Build from the attackers_of / defenders_of sets used by compute_aggregations
+    index = {aid: i for i, aid in enumerate(arg_ids)}
+    rows, cols, signs = [], [], []
+    for aid in arg_ids:
+        t = index[aid]
+        for rel, sources in (('defend', defenders_of.get(aid, ())), ('attack', attackers_of.get(aid, ()))):
+            for b in sources:
+                s = index.get(b)
+                if s is not None:
+                    rows.append(t)
+                    cols.append(s)
+                    signs.append(RELATION_SIGNS[rel])
+    return SignedAdjacency(arg_ids, rows, cols, signs)
@@ -0,0 +1,106 @@
+import importlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ARGUMENT_IDS = ['N', 'a1', 'a2', 'a3', 'a4', 'a5']
+
+
+def expected_relation(source, target):
+    return 'attack' if (ARGUMENT_IDS.index(source) + ARGUMENT_IDS.index(target)) % 2 else 'defend'
+
+
+class MockCompletions(BaseHTTPRequestHandler):
+    # /v1/chat/completions: answers every target with expected_relation, after `delays[source]`
+    # seconds; sources in `fail_once` get one 504 first
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['messages'][1]['content']
+        source = re.search(r'CURRENT argument \((\w+)\)', prompt).group(1)
+        targets = re.findall(r'^\s+"(\w+)": "attack"', prompt, re.M)
+        with server.lock:
+            server.arrivals.append((time.monotonic(), source))
+            fail = source in server.fail_once
+            server.fail_once.discard(source)
+        if fail:
+            server.failed_at = time.monotonic()
+            self._reply(504, {'error': {'message': 'Gateway Timeout', 'type': 'timeout'}})
+            return
+        time.sleep(server.delays.get(source, 0.0))
+        content = json.dumps({t: expected_relation(source, t) for t in targets})
+        self._reply(200, {'id': 'x', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                          'choices': [{'index': 0, 'finish_reason': 'stop',
+                                       'message': {'role': 'assistant', 'content': content}}],
+                          'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2}})
+
+    def _reply(self, status, payload):
+        out = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockCompletions)
+    server.lock = threading.Lock()
+    server.arrivals = []
+    server.delays = {}
+    server.fail_once = set()
+    server.failed_at = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # The module builds its client at import time from OPENAI_BASE_URL
+    monkeypatch.setenv('OPENAI_BASE_URL', f'http://127.0.0.1:{server.server_address[1]}/v1')
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    extraction = importlib.reload(importlib.import_module('OpenAI'))
+    assert extraction.BASE_URL == f'http://127.0.0.1:{server.server_address[1]}/v1'
+    yield server, extraction
+    server.shutdown()
+    server.server_close()
+
+
+def arguments():
+    return [{'id': aid, 'text': f'Argument {aid}', 'stance': 'pro'} for aid in ARGUMENT_IDS]
+
+
+def test_rate_limit_and_order(mock_api):
+    server, extraction = mock_api
+    # Early arguments answer last, so completion order is the reverse of submission order
+    server.delays = {aid: 0.3 - 0.05 * i for i, aid in enumerate(ARGUMENT_IDS)}
+    args = arguments()
+    rate = 10.0
+    extraction.extract_all(args, workers=4, rate=rate)
+
+    times = sorted(t for t, _ in server.arrivals)
+    assert len(times) == len(ARGUMENT_IDS)
+    # Capacity 1: the k-th request waits for k tokens at `rate` per second, across all workers
+    assert times[-1] - times[0] >= (len(times) - 1) / rate * 0.9
+    assert [arg['id'] for arg in args] == ARGUMENT_IDS
+    for arg in args:
+        assert arg['relationships'] == {t: expected_relation(arg['id'], t) for t in ARGUMENT_IDS if t != arg['id']}
+
+
+def test_504_backoff_pauses_every_worker(mock_api):
+    server, extraction = mock_api
+    server.fail_once = {'N'}
+    server.delays = {aid: 0.05 for aid in ARGUMENT_IDS}
+    args = arguments()
+    extraction.extract_all(args, workers=3, rate=100.0)
+
+    assert server.failed_at is not None
+    later = [t for t, _ in server.arrivals if t > server.failed_at]
+    # backoff(2 ** 0): one second during which no worker sends anything
+    assert later and min(later) - server.failed_at >= 0.9
+    assert [source for _, source in server.arrivals].count('N') == 2
+    assert all(arg['relationships'] for arg in args)
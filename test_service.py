@@ -0,0 +1,98 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from service import AggregationService, HTTPError
+
+ARGUMENTS = [
+    {'id': 'N', 'relationships': {'a1': 'attack'}},
+    {'id': 'a1', 'relationships': {'N': 'attack', 'a2': 'defend'}},
+    {'id': 'a2', 'relationships': {}},
+]
+LABELS = [[1, -1, 0], [1, 0, 0], [-1, 1, 1]]
+
+
+def aggregate(request):
+    service = AggregationService(workers=1)
+    try:
+        body, _ = asyncio.run(service.aggregate(request))
+    finally:
+        service.executor.shutdown()
+    return json.loads(body)
+
+
+def bad_request(request):
+    with pytest.raises(HTTPError) as e:
+        aggregate(request)
+    assert e.value.status == HTTPStatus.BAD_REQUEST
+    return str(e.value)
+
+
+def test_valid_request():
+    result = aggregate({'arguments': ARGUMENTS, 'labels': LABELS, 'methods': ['Majority (M)'], 'mode': 'exact'})
+    assert result['n_agents'] == 3
+    assert list(result['labels']) == ['Majority (M)']
+    assert result['labels']['Majority (M)']['N'] == 'in'
+
+
+# --- Ballots ---
+
+@pytest.mark.parametrize('labels', [
+    [[1, 0]],           # wrong width
+    [[1, 0, 2]],        # out of range
+    [[1, 0, True]],     # not an int
+    [[1, 0, '1']],
+    'x',
+])
+def test_malformed_label_matrix(labels):
+    bad_request({'arguments': ARGUMENTS, 'labels': labels})
+
+
+@pytest.mark.parametrize('agents', [
+    'x',
+    [1],
+    [{'id': 'x'}],
+    [{'id': 'x', 'labels': {'N': 'maybe'}}],
+])
+def test_malformed_agents(agents):
+    bad_request({'arguments': ARGUMENTS, 'agents': agents})
+
+
+# --- Graph, methods and root ---
+
+@pytest.mark.parametrize('arguments', [
+    [1, 2],
+    [{'id': 'N', 'relationships': 5}],
+    [{'id': 'N', 'relationships': {'a1': ['attack']}}],
+    [{'relationships': {}}],
+    [{'id': 3}],
+    [{'id': 'N'}, {'id': 'N'}],
+])
+def test_malformed_arguments(arguments):
+    bad_request({'arguments': arguments, 'labels': []})
+
+
+@pytest.mark.parametrize('methods', [[[1]], 'Majority (M)', [None], ['No such method']])
+def test_malformed_methods(methods):
+    bad_request({'arguments': ARGUMENTS, 'labels': LABELS, 'methods': methods, 'mode': 'exact'})
+
+
+@pytest.mark.parametrize('root', [1, ['N'], None, 'missing'])
+def test_malformed_root(root):
+    bad_request({'arguments': ARGUMENTS, 'labels': LABELS, 'root': root})
+
+
+def test_malformed_debate_name():
+    bad_request({'debate': ['x'], 'labels': LABELS})
+
+
+def test_register_rejects_malformed_arguments():
+    service = AggregationService(workers=1)
+    body = json.dumps({'name': 'd', 'arguments': [{'id': 'N', 'relationships': 5}]}).encode()
+    with pytest.raises(HTTPError) as e:
+        asyncio.run(service.route('POST', '/debates', body))
+    service.executor.shutdown()
+    assert e.value.status == HTTPStatus.BAD_REQUEST
+    assert 'd' not in service.debates
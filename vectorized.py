@@ -0,0 +1,103 @@
+import numpy as np
+
+# Label encoding used by the label matrix (agents x arguments, int8).
+# The numeric value doubles as the preference rank offset: in > undec > out.
+IN, UNDEC, OUT = 1, 0, -1
+LABEL_CODES = {'in': IN, 'undec': UNDEC, 'out': OUT}
+CODE_LABELS = {IN: 'in', UNDEC: 'undec', OUT: 'out'}
+
+
+def encode_labels(agents, arg_ids):
+    # Encode every agent once; labels missing from an agent are treated as 'undec'
+    col = {aid: j for j, aid in enumerate(arg_ids)}
+    rows = []
+    # Filled as Python lists: item assignment on numpy rows is several times slower
+    for agent in agents:
+        row = [UNDEC] * len(col)
+        for aid, label in agent['labels'].items():
+            j = col.get(aid)
+            if j is not None:
+                row[j] = LABEL_CODES.get(label, UNDEC)
+        rows.append(row)
+    return np.array(rows, dtype=np.int8).reshape(len(rows), len(col))
+
+
+# The functions below also accept a leading scenario axis, e.g. L of shape
+# (scenarios, agents, arguments) and matrices of shape (scenarios, A, A).
+
+def vote_counts(L):
+    in_c = np.count_nonzero(L == IN, axis=-2)
+    out_c = np.count_nonzero(L == OUT, axis=-2)
+    undec_c = L.shape[-2] - in_c - out_c
+    return in_c, out_c, undec_c
+
+
+def _indicator(L, code):
+    # float64 so the products below go through BLAS; exact for < 2**53 agents
+    return (L == code).astype(np.float64)
+
+
+def in_out_wins(L):
+    # W[i, j] = number of agents labelling i 'in' and j 'out'
+    W = np.swapaxes(_indicator(L, IN), -1, -2) @ _indicator(L, OUT)
+    return np.rint(W).astype(np.int64)
+
+
+def pairwise_matrix(L):
+    # P[i, j] = number of agents ranking i strictly above j (in > undec > out)
+    in_m = _indicator(L, IN)
+    out_m = _indicator(L, OUT)
+    undec_m = 1.0 - in_m - out_m
+    P = np.swapaxes(in_m, -1, -2) @ (undec_m + out_m) + np.swapaxes(undec_m, -1, -2) @ out_m
+    return np.rint(P).astype(np.int64)
+
+
+# --- Score vectors (one entry per argument, in arg_ids order) ---
+
+def borda_scores(in_c, out_c):
+    return in_c.astype(np.int64) - out_c
+
+
+def copeland_scores(M):
+    # Pairwise wins minus losses; the diagonal is always a tie
+    return np.sign(M - np.swapaxes(M, -1, -2)).sum(axis=-1)
+
+
+def copeland_decided(M):
+    # Arguments with at least one non-tied pairwise contest
+    return (M != np.swapaxes(M, -1, -2)).any(axis=-1)
+
+
+def simpson_scores(M):
+    # Worst pairwise score of each argument against any other argument
+    n = M.shape[-1]
+    if n < 2:
+        return np.zeros(M.shape[:-1], dtype=np.int64)
+    off = np.where(np.eye(n, dtype=bool), np.inf, M)
+    return off.min(axis=-1).astype(np.int64)
+
+
+def apref_scores(P):
+    return P.sum(axis=-1) - P.sum(axis=-2)
+
+
+def veto_scores(out_c):
+    return -out_c.astype(np.int64)
+
+
+def label_vector(scores):
+    # Vectorised label_from_score: sign of the score, still encoded as int8
+    return np.sign(scores).astype(np.int8)
+
+
+def labels_to_dict(codes, arg_ids):
+    return {aid: CODE_LABELS[int(c)] for aid, c in zip(arg_ids, codes)}
+
+
+def to_count_dict(arg_ids, values):
+    return dict(zip(arg_ids, np.asarray(values).tolist()))
+
+
+def to_sparse_count_dict(arg_ids, values):
+    # Zero counts are left out, matching the defaultdict counters built per agent
+    return {aid: v for aid, v in zip(arg_ids, np.asarray(values).tolist()) if v}